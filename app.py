@@ -9,14 +9,22 @@ Version: 1.2.1
 License: MIT
 """
 
+import asyncio
+import hashlib
+import hmac
 import os
 import logging
-from typing import List, Optional, Dict, Any
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Annotated, List, Optional, Dict, Any
 
-from fastapi import FastAPI, HTTPException, Security, Response
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Request, Security, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 # ---------------------------------------------------------------------
 # Logging
@@ -24,12 +32,13 @@ from pydantic import BaseModel, Field
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("bache-rag-api")
 
-# Import the RAG engine from the local package
-from rag.retrieve import Retriever
-from rag.answer import answer_from_chunks
-# --- Debug: confirm which rag.answer is loaded ---
-import rag.answer as _answer_mod
-logger.info("Using rag.answer from: %s", getattr(_answer_mod, "__file__", "<unknown>"))
+# The RAG engine (FAISS, pyarrow, OpenAI SDK) is imported lazily in the startup
+# hook / route bodies, so importing app.py (and forking workers) stays cheap.
+from rag.cache import ResponseCache
+
+if TYPE_CHECKING:
+    from rag.batcher import QueryCoalescer
+    from rag.retrieve import Retriever
 
 # ---------------------------------------------------------------------
 # Settings
@@ -45,21 +54,39 @@ FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", "vectors/bache-talks.index.fais
 METADATA_PATH = os.getenv("METADATA_PATH", "vectors/bache-talks.embeddings.parquet")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-large")
 MAX_PER_TALK = int(os.getenv("MAX_PER_TALK", "2"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))  # per worker
+OPENAPI_PATH = os.getenv("OPENAPI_PATH", "openapi.json")  # written at build time by scripts/dump_openapi.py
+WARMUP = os.getenv("WARMUP", "1") == "1"  # 0 = skip startup warmup (tests / quick local restarts)
+MAX_QUERY_CHARS = int(os.getenv("MAX_QUERY_CHARS", "2000"))  # longer queries are rejected with 422
 
 # Single security scheme — avoids GPT “multiple security schemes” error
 api_key_header = APIKeyHeader(name="Authorization", scheme_name="ApiKeyAuth", auto_error=False)
 
 
+_EXPECTED_AUTH = ("Bearer " + API_KEY).encode()
+
+
 def _check_auth(authorization: Optional[str]):
-    """Simple bearer check."""
-    if not authorization or authorization != f"Bearer {API_KEY}":
+    """Simple bearer check (constant-time compare against a precomputed header)."""
+    if not authorization or not hmac.compare_digest(authorization.encode(), _EXPECTED_AUTH):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+def _require_auth(authorization: Optional[str] = Security(api_key_header)) -> None:
+    """Route dependency for the RAG endpoints. Listed in dependencies=[...] it
+    resolves before get_retriever/get_coalescer, so a bad key is 401 even
+    while the retriever is down (503)."""
+    _check_auth(authorization)
+
+
 # ---------------------------------------------------------------------
 # Models
 # ---------------------------------------------------------------------
 class Chunk(BaseModel):
+    # Retriever rows carry extra columns (venue, date, …); drop them silently
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
+
     # Core
     id: Optional[int] = None
     talk_id: Optional[str] = None
@@ -93,8 +120,13 @@ class Chunk(BaseModel):
     ts_url: Optional[str] = None        # convenience: timestamped YouTube link if available
 
 
+# Non-empty and bounded, so a bad query is rejected up front instead of failing
+# the shared embeddings call of the batch it would have been coalesced into.
+QueryText = Annotated[str, Field(min_length=1, max_length=MAX_QUERY_CHARS)]
+
+
 class SearchRequest(BaseModel):
-    query: str = Field(..., description="Natural-language query")
+    query: QueryText = Field(..., description="Natural-language query")
     top_k: int = Field(8, ge=1, le=20, description="Top-K result limit (1–20)")
 
 
@@ -102,7 +134,20 @@ class SearchResponse(BaseModel):
     chunks: List[Chunk]
 
 
+class BatchSearchRequest(BaseModel):
+    queries: List[QueryText] = Field(
+        ..., min_length=1, max_length=32, description="Natural-language queries (1–32)"
+    )
+    top_k: int = Field(8, ge=1, le=20, description="Top-K result limit per query (1–20)")
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
+
+
 class Citation(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     talk_id: Optional[str] = None
     archival_title: Optional[str] = None
     recorded_date: Optional[str] = None
@@ -117,7 +162,7 @@ class Citation(BaseModel):
 
 
 class AnswerRequest(BaseModel):
-    query: str
+    query: QueryText
     chunk_ids: List[str] = Field(
         default_factory=list,
         description=(
@@ -141,7 +186,25 @@ class HealthResponse(BaseModel):
 # ---------------------------------------------------------------------
 # App setup
 # ---------------------------------------------------------------------
-app = FastAPI(title=SERVICE_NAME, version=SERVICE_VERSION)
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    """Startup/shutdown (see _startup/_shutdown below)."""
+    await _startup()
+    try:
+        yield
+    finally:
+        await _shutdown()
+
+
+# /openapi.json, /docs and /redoc are served below from pre-serialized schema bytes
+# Responses are rendered with orjson (OPT_SERIALIZE_NUMPY | OPT_NON_STR_KEYS)
+app = FastAPI(
+    title=SERVICE_NAME,
+    version=SERVICE_VERSION,
+    openapi_url=None,
+    default_response_class=ORJSONResponse,
+    lifespan=_lifespan,
+)
 
 # Optional CORS (not required for GPT Actions)
 if ALLOW_ORIGINS:
@@ -156,167 +219,382 @@ if ALLOW_ORIGINS:
         allow_headers=["*"],
     )
 
-# Singleton Retriever
-_RETRIEVER = Retriever(
-    parquet_path=METADATA_PATH,
-    faiss_path=FAISS_INDEX_PATH,
-    model=EMBED_MODEL,
-    per_talk_cap=MAX_PER_TALK,
-    top_k_default=8,
-)
+# gzip /search and /answer bodies (transcript prose compresses ~5×). Small
+# payloads (/, /_debug, 401s) stay under minimum_size and go out as-is.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Retriever + coalescer are built in the lifespan startup (see _startup), not at
+# import time, so uvicorn can fork fast and load errors surface as 503s.
+app.state.openai = None
+app.state.retriever = None
+app.state.coalescer = None
+app.state.retriever_error = None
+app.state.file_stat = None  # {path: {"size", "mtime"} | None}, see _stat_files()
 
+# Exact + semantic response cache shared by /search and /answer
+_CACHE = ResponseCache()
 
-def _normalize_date(row: Dict[str, Any]) -> str:
-    """Prefer published → date → recorded_date, return '' if none."""
-    return str(row.get("published") or row.get("date") or row.get("recorded_date") or "")
 
+def _rows_to_response(rows: List[Dict[str, Any]]) -> SearchResponse:
+    """
+    Map retriever rows → SearchResponse without re-validation.
+    Rows come from our own Parquet and arrive already typed and scrubbed of
+    NaN/Inf/NumPy scalars (with recorded_date precomputed) by Retriever._format_rows,
+    so model_construct is safe; unknown columns are dropped as with extra="ignore".
+    """
+    return SearchResponse.model_construct(chunks=[Chunk.model_construct(**r) for r in rows])
 
-def _row_to_chunk(row: Dict[str, Any]) -> Chunk:
-    """Map retriever row → API Chunk model and scrub NaN/Inf/NumPy scalars."""
-    import math
 
-    def _n(v):
-        # unwrap numpy scalar
-        if hasattr(v, "item"):
-            try:
-                v = v.item()
-            except Exception:
-                pass
-        # NaN/Inf → None
-        if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
-            return None
-        return v
-
-    return Chunk(
-        id=_n(row.get("id")),
-        talk_id=_n(row.get("talk_id")),
-        archival_title=_n(row.get("archival_title")),
-        recorded_date=_normalize_date(row) or None,
-        published=_n(row.get("published")),
-        chunk_index=_n(row.get("chunk_index")),
-        text=_n(row.get("text")),
-        token_est=_n(row.get("token_est") or row.get("token_estimate")),
-        hash=_n(row.get("hash")),
-        channel=_n(row.get("channel")),
-        source_type=_n(row.get("source_type")),
-        citation=_n(row.get("citation")),
-        url=_n(row.get("url")),
-        transcript_path=_n(row.get("transcript_path")),
-        _score=_n(row.get("_score")),
-        # timing
-        youtube_id=_n(row.get("youtube_id")),
-        start_sec=_n(row.get("start_sec")),
-        end_sec=_n(row.get("end_sec")),
-        start_hhmmss=_n(row.get("start_hhmmss")),
-        end_hhmmss=_n(row.get("end_hhmmss")),
-        source_used=_n(row.get("source_used")),
-        method=_n(row.get("method")),
-        confidence=_n(row.get("confidence")),
-        ts_url=_n(row.get("ts_url")),
-    )
+def _rows_to_citations(rows: List[Dict[str, Any]]) -> List[Citation]:
+    """
+    Map retriever rows → Citation models without re-validation.
+    Each row carries a citation_payload dict built once at load by the
+    Retriever (coerced fields; ts_url only when timestamped), so this is a
+    pass-through.
+    """
+    return [Citation.model_construct(**r["citation_payload"]) for r in rows]
+
+
+def _json(model: BaseModel) -> Response:
+    """
+    Serialize a response model straight to JSON (pydantic-core, by alias).
+    Returning a Response skips FastAPI's response_model pass (dump → re-validate
+    → jsonable dict → orjson); response_model= stays on the routes for the schema.
+    """
+    return Response(content=model.model_dump_json(by_alias=True), media_type="application/json")
+
+
+def get_retriever(request: Request) -> "Retriever":
+    """Dependency: the process-wide Retriever loaded at startup."""
+    retriever = request.app.state.retriever
+    if retriever is None:
+        raise HTTPException(status_code=503, detail="Retriever not loaded")
+    return retriever
+
+
+def get_coalescer(request: Request) -> "QueryCoalescer":
+    """Dependency: the process-wide QueryCoalescer (requires a loaded Retriever)."""
+    coalescer = request.app.state.coalescer
+    if coalescer is None:
+        raise HTTPException(status_code=503, detail="Retriever not loaded")
+    return coalescer
 
 
 def _status_dict() -> dict:
     """Expose retriever runtime status + env/config."""
     try:
-        status = _RETRIEVER.status()
+        if app.state.retriever is None:
+            status = {"error": app.state.retriever_error or "Retriever not loaded"}
+        else:
+            status = app.state.retriever.status()
     except Exception as e:
         status = {"error": f"{type(e).__name__}: {e}"}
     status.update(
         {
             "faiss_index_path": FAISS_INDEX_PATH,
             "metadata_path": METADATA_PATH,
-            "embed_model": EMBED_MODEL,
             "per_talk_cap": MAX_PER_TALK,
             "has_openai_key": bool(os.getenv("OPENAI_API_KEY")),
+            "coalescer": app.state.coalescer.status() if app.state.coalescer else None,
+            "cache": _CACHE.status(),
         }
     )
+    status.setdefault("embed_model", EMBED_MODEL)  # the loaded retriever's model wins
     return status
 
 
 # ---------------------------------------------------------------------
 # Routes
 # ---------------------------------------------------------------------
-@app.get("/", tags=["meta"], summary="Root", response_model=HealthResponse)
-def root() -> HealthResponse:
-    return HealthResponse(ok=True, service=SERVICE_NAME, version=SERVICE_VERSION)
+# Static health payloads, serialized once
+_HEALTH_BODY = orjson.dumps(
+    HealthResponse(ok=True, service=SERVICE_NAME, version=SERVICE_VERSION).model_dump()
+)
+_UNHEALTHY_BODY = orjson.dumps(
+    HealthResponse(ok=False, service=SERVICE_NAME, version=SERVICE_VERSION).model_dump()
+)
+
+
+@app.get(
+    "/",
+    tags=["meta"],
+    summary="Root",
+    response_model=HealthResponse,
+    responses={503: {"model": HealthResponse, "description": "Retriever failed to load"}},
+)
+def root() -> Response:
+    # A worker whose retriever failed to load only answers 503s; report it
+    # unhealthy so health checks take it out of rotation
+    if app.state.retriever_error is not None:
+        return Response(content=_UNHEALTHY_BODY, status_code=503, media_type="application/json")
+    return Response(content=_HEALTH_BODY, media_type="application/json")
 
 
 @app.head("/", include_in_schema=False)
 def root_head():
-    return Response(status_code=200)
+    return Response(status_code=503 if app.state.retriever_error is not None else 200)
 
 
-@app.post("/search", response_model=SearchResponse, tags=["rag"], summary="Semantic search over chunk index")
-def search(req: SearchRequest, authorization: Optional[str] = Security(api_key_header)):
-    _check_auth(authorization)
+@app.post(
+    "/search",
+    response_model=SearchResponse,
+    tags=["rag"],
+    summary="Semantic search over chunk index",
+    dependencies=[Depends(_require_auth)],
+)
+async def search(
+    req: SearchRequest,
+    coalescer: "QueryCoalescer" = Depends(get_coalescer),
+):
     logger.info("SEARCH query=%r top_k=%d", req.query, req.top_k)
-    rows = _RETRIEVER.search(req.query, k=req.top_k)
-    chunks = [_row_to_chunk(r) for r in rows]
-    for c in chunks:
-        if not c.recorded_date:
-            c.recorded_date = c.published or None
-    return SearchResponse(chunks=chunks)
+
+    cached = _CACHE.get("search", req.query, req.top_k)
+    if cached is None:
+        # One batch round-trip: embed, probe the semantic tier, search on a miss.
+        vec, cached, rows = await coalescer.lookup(
+            req.query, req.top_k, lambda v: _CACHE.get_similar("search", req.top_k, v)
+        )
+    if cached is not None:
+        logger.info("SEARCH cache_hit=True")
+        return _json(cached)
+
+    resp = _rows_to_response(rows)
+    _CACHE.put("search", req.query, req.top_k, resp, vec=vec)
+    return _json(resp)
 
 
-@app.post("/answer", response_model=AnswerResponse, tags=["rag"], summary="Citation-grounded synthesis")
-def answer(req: AnswerRequest, authorization: Optional[str] = Security(api_key_header)):
+@app.post(
+    "/search/batch",
+    response_model=BatchSearchResponse,
+    tags=["rag"],
+    summary="Semantic search for several queries in one call",
+    dependencies=[Depends(_require_auth)],
+)
+async def search_batch(
+    req: BatchSearchRequest,
+    retriever: "Retriever" = Depends(get_retriever),
+):
+    logger.info("SEARCH_BATCH queries=%d top_k=%d", len(req.queries), req.top_k)
+    results = await retriever.asearch_batch(req.queries, k=req.top_k)
+    return _json(BatchSearchResponse.model_construct(results=[_rows_to_response(rows) for rows in results]))
+
+
+@app.post(
+    "/answer",
+    response_model=AnswerResponse,
+    tags=["rag"],
+    summary="Citation-grounded synthesis",
+    dependencies=[Depends(_require_auth)],
+)
+async def answer(
+    req: AnswerRequest,
+    retriever: "Retriever" = Depends(get_retriever),
+    coalescer: "QueryCoalescer" = Depends(get_coalescer),
+):
     """
     Generate a short, citation-grounded summary with timestamped sources.
     (No chunk numbers appear in the prose; that’s handled by rag/answer.py.)
     """
-    _check_auth(authorization)
+    return _json(await _compose_answer(req, retriever, coalescer))
+
+
+async def _compose_answer(req: AnswerRequest, retriever: "Retriever", coalescer: "QueryCoalescer") -> AnswerResponse:
+    """Cache lookup → retrieval → composition for /answer and /answer_stream."""
     logger.info("ANSWER query=%r chunk_ids=%d", req.query, len(req.chunk_ids or []))
 
-    # Retrieve
+    # Cache: the composed answer depends only on the rows, so answers built
+    # from explicit chunk_ids are keyed by the ids alone (any query wording
+    # hits). Free-text queries also try the semantic tier, probed inside the
+    # same coalesced batch that runs the retrieval on a miss. The id list is
+    # JSON-encoded so ["a,b"] and ["a", "b"] can't share a key.
+    variant = orjson.dumps(req.chunk_ids or []).decode()
+    vec = None
     rows: List[Dict[str, Any]] = []
-    if req.chunk_ids and hasattr(_RETRIEVER, "get_by_ids"):
-        try:
-            rows = _RETRIEVER.get_by_ids(req.chunk_ids)  # type: ignore[attr-defined]
-        except Exception as e:
-            logger.warning("get_by_ids failed (%s); falling back to search", e)
-
-    if not rows:
-        rows = _RETRIEVER.search(req.query, k=8)
+    cached = _CACHE.get("answer", "", variant) if req.chunk_ids else None
+    if cached is None:
+        cached = _CACHE.get("answer", req.query, variant)
+    if cached is None and not req.chunk_ids:
+        vec, cached, rows = await coalescer.lookup(
+            req.query, 8, lambda v: _CACHE.get_similar("answer", variant, v)
+        )
+    if cached is not None:
+        logger.info("ANSWER cache_hit=True")
+        return cached
+
+    # Retrieve (free-text rows already came back from the lookup above)
+    cache_query = req.query
+    if req.chunk_ids:
+        if hasattr(retriever, "get_by_ids"):
+            try:
+                rows = retriever.get_by_ids(req.chunk_ids)  # type: ignore[attr-defined]
+            except Exception as e:
+                logger.warning("get_by_ids failed (%s); falling back to search", e)
+        if rows:
+            cache_query = ""
+        else:
+            rows = await coalescer.submit(req.query, 8)
     if not rows:
         raise HTTPException(status_code=404, detail="No matching chunks found")
 
     # Compose (rag/answer.py ensures human labels with no “chunk ”)
+    from rag.answer import answer_from_chunks
+
+    # Inline on purpose: extractive composition takes ~20 µs for 8 rows, less
+    # than an asyncio.to_thread hop (~60 µs). Offload it if it ever calls an LLM.
     answer_text = answer_from_chunks(req.query, rows, max_snippets=5)
 
     # Build JSON citations (OK to include chunk_index here; clients may use it)
-    citations: List[Citation] = []
-    for r in rows[:6]:
-        # timestamped link if timing is present
-        ts_url = None
+    citations = _rows_to_citations(rows[:6])
+
+    resp = AnswerResponse.model_construct(answer=answer_text, citations=citations)
+    _CACHE.put("answer", cache_query, variant, resp, vec=vec)
+    return resp
+
+
+def _sse(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+@app.post(
+    "/answer_stream",
+    tags=["rag"],
+    summary="Citation-grounded synthesis as Server-Sent Events",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "SSE stream: start, delta, citations, done (or error) events",
+            "content": {"text/event-stream": {"schema": {"type": "string"}}},
+        }
+    },
+    dependencies=[Depends(_require_auth)],
+)
+async def answer_stream(
+    req: AnswerRequest,
+    retriever: "Retriever" = Depends(get_retriever),
+    coalescer: "QueryCoalescer" = Depends(get_coalescer),
+):
+    """
+    Same result as /answer, as an SSE stream: `start` is flushed immediately
+    (before the embedding round-trip), then `delta`, `citations`, and `done` —
+    or `error` with the status /answer would have returned (500 for anything
+    unexpected). The answer is composed in one piece, so today it arrives as a
+    single `delta`: no time-to-first-token gain over /answer beyond the early
+    `start`. Clients should still concatenate deltas.
+    """
+
+    async def events():
+        yield _sse("start", {"query": req.query})
         try:
-            yt = r.get("youtube_id")
-            ss = r.get("start_sec")
-            if yt and ss is not None:
-                ts_url = f"https://youtu.be/{yt}?t={int(max(0, float(ss)))}"
+            resp = await _compose_answer(req, retriever, coalescer)
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+            return
         except Exception:
-            ts_url = r.get("url") or None
-
-        citations.append(
-            Citation(
-                talk_id=str(r.get("talk_id") or ""),
-                archival_title=str(r.get("archival_title") or ""),
-                recorded_date=_normalize_date(r) or None,
-                published=r.get("published"),
-                chunk_index=int(r.get("chunk_index") or 0),
-                citation=r.get("citation"),
-                url=r.get("url"),
-                start_hhmmss=r.get("start_hhmmss"),
-                ts_url=ts_url,
+            # The 200 + headers are already sent, so report the failure in-band.
+            logger.exception("ANSWER_STREAM failed query=%r", req.query)
+            yield _sse("error", {"status": 500, "detail": "Internal Server Error"})
+            return
+        yield _sse("delta", resp.answer)
+        yield _sse("citations", [c.model_dump() for c in resp.citations])
+        yield _sse("done", {})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _warm_models() -> None:
+    """Finish building schemas/serializers and push one row through the response path, so the first request doesn't pay for it."""
+    for m in (Chunk, Citation, SearchResponse, BatchSearchResponse, AnswerResponse):
+        m.model_rebuild()
+    _json(_rows_to_response([{"talk_id": "", "_score": 0.0}]))
+    _json(AnswerResponse.model_construct(answer="", citations=_rows_to_citations([{"citation_payload": {"talk_id": ""}}])))
+
+
+async def _startup() -> None:
+    """Load the retriever, then (WARMUP=1) warm FAISS and the embedding client."""
+    if WARMUP:
+        _warm_models()
+    app.state.file_stat = _stat_files()
+    try:
+        import httpx
+        from openai import AsyncOpenAI
+
+        from rag.batcher import QueryCoalescer
+        from rag.retrieve import EMBED_BACKEND, Retriever
+
+        # One pooled HTTP/2 client for every OpenAI call made by this process
+        # (none needed when queries are embedded in-process)
+        if EMBED_BACKEND == "openai":
+            app.state.openai = AsyncOpenAI(
+                timeout=OPENAI_TIMEOUT,
+                max_retries=2,
+                http_client=httpx.AsyncClient(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                    ),
+                    timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=3.0),
+                ),
             )
+        # Parquet + FAISS load is blocking I/O; keep the loop free meanwhile
+        retriever = await asyncio.to_thread(
+            Retriever,
+            parquet_path=METADATA_PATH,
+            faiss_path=FAISS_INDEX_PATH,
+            model=EMBED_MODEL,
+            per_talk_cap=MAX_PER_TALK,
+            top_k_default=8,
+            aclient=app.state.openai,
         )
+    except Exception as e:
+        app.state.retriever_error = f"{type(e).__name__}: {e}"
+        logger.exception("Retriever failed to load; / (health), /search and /answer will return 503")
+        return
+
+    app.state.retriever = retriever
+    # Pools concurrent /search queries into one embedding request + one FAISS call
+    app.state.coalescer = QueryCoalescer(retriever)
+
+    if not WARMUP:
+        return
+    # FAISS first (no network needed): OMP pool + mmap'd index pages
+    try:
+        await asyncio.to_thread(retriever.warmup)
+    except Exception as e:
+        logger.warning("FAISS warmup failed (%s); continuing cold", e)
+    # Then one canary embedding: opens the pooled OpenAI connection (TLS +
+    # HTTP/2) or loads the local encoder's kernels
+    try:
+        await retriever._aembed_queries(["warmup"])
+    except Exception as e:
+        logger.warning("Embedding warmup failed (%s); continuing cold", e)
+
 
-    return AnswerResponse(answer=answer_text, citations=citations)
+async def _shutdown() -> None:
+    if app.state.coalescer is not None:
+        await app.state.coalescer.aclose()
+    if app.state.openai is not None:
+        await app.state.openai.close()
 
 
 # --- DEBUG --------------------------------------------------------------
+def _stat_files() -> Dict[str, Optional[Dict[str, Any]]]:
+    """One os.stat per vector file (None if missing); cached on app.state by startup and /_debug?refresh=1."""
+    out: Dict[str, Optional[Dict[str, Any]]] = {}
+    for path in (FAISS_INDEX_PATH, METADATA_PATH):
+        try:
+            st = os.stat(path)
+            out[path] = {"size": st.st_size, "mtime": int(st.st_mtime)}
+        except OSError:
+            out[path] = None
+    return out
+
+
 @app.get("/_debug", tags=["meta"], summary="Debug file/env status")
-def debug_status() -> dict:
+def debug_status(refresh: bool = False) -> dict:
+    if refresh or app.state.file_stat is None:
+        app.state.file_stat = _stat_files()
+    files = app.state.file_stat
     return {
         "cwd": os.getcwd(),
         "env": {
@@ -326,9 +604,10 @@ def debug_status() -> dict:
             "MAX_PER_TALK": MAX_PER_TALK,
         },
         "exists": {
-            "faiss_index_exists": os.path.exists(FAISS_INDEX_PATH),
-            "metadata_exists": os.path.exists(METADATA_PATH),
+            "faiss_index_exists": files[FAISS_INDEX_PATH] is not None,
+            "metadata_exists": files[METADATA_PATH] is not None,
         },
+        "files": files,
     }
 
 
@@ -340,10 +619,39 @@ def get_rag_status() -> dict:
 # ---------------------------------------------------------------------
 # Custom OpenAPI (fixes GPT Action warnings)
 # ---------------------------------------------------------------------
-def custom_openapi():
-    if app.openapi_schema:
-        return app.openapi_schema
-
+def _openapi_fingerprint() -> str:
+    """Cheap stand-in for the generated schema: this module's source (routes and
+    request/response models), the route table, version, BASE_URL and the
+    FastAPI/Pydantic versions that render it."""
+    import fastapi
+    import pydantic
+
+    h = hashlib.sha256()
+    with open(__file__, "rb") as f:
+        h.update(f.read())
+    for r in app.routes:
+        h.update(repr((getattr(r, "path", ""), sorted(getattr(r, "methods", None) or ()), r.name)).encode())
+    h.update(repr((SERVICE_VERSION, BASE_URL, fastapi.__version__, pydantic.VERSION)).encode())
+    return h.hexdigest()
+
+
+def _load_openapi_file() -> Optional[Dict[str, Any]]:
+    """Schema dumped at build time, if present and its fingerprint matches this build."""
+    try:
+        with open(OPENAPI_PATH, "rb") as f:
+            schema = orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, orjson.JSONDecodeError) as e:
+        logger.warning("Ignoring unreadable %s: %s", OPENAPI_PATH, e)
+        return None
+    if schema.get("x-fingerprint") != _openapi_fingerprint():
+        logger.warning("Ignoring stale %s (rerun scripts/dump_openapi.py); regenerating in-process", OPENAPI_PATH)
+        return None
+    return schema
+
+
+def build_openapi() -> Dict[str, Any]:
     openapi_schema = get_openapi(
         title=SERVICE_NAME,
         version=SERVICE_VERSION,
@@ -355,8 +663,55 @@ def custom_openapi():
         "ApiKeyAuth": {"type": "apiKey", "in": "header", "name": "Authorization"}
     }
     openapi_schema["security"] = [{"ApiKeyAuth": []}]
-    app.openapi_schema = openapi_schema
+    openapi_schema["x-fingerprint"] = _openapi_fingerprint()
+    return openapi_schema
+
+
+def custom_openapi():
+    if app.openapi_schema:
+        return app.openapi_schema
+    # Prefer the build-time dump; walking the routes/models is the dev fallback
+    app.openapi_schema = _load_openapi_file() or build_openapi()
     return app.openapi_schema
 
 
-app.openapi = custom_openapi
\ No newline at end of file
+app.openapi = custom_openapi
+
+
+@app.get("/openapi.json", include_in_schema=False)
+def openapi_json() -> Response:
+    """Serve the schema from bytes serialized once per process (orjson)."""
+    body = getattr(app.state, "openapi_bytes", None)
+    if body is None:
+        body = app.state.openapi_bytes = orjson.dumps(app.openapi())
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/docs", include_in_schema=False)
+def swagger_docs():
+    return get_swagger_ui_html(openapi_url="/openapi.json", title=f"{SERVICE_NAME} - Swagger UI")
+
+
+@app.get("/redoc", include_in_schema=False)
+def redoc_docs():
+    return get_redoc_html(openapi_url="/openapi.json", title=f"{SERVICE_NAME} - ReDoc")
+
+
+# ---------------------------------------------------------------------
+# Direct entry: python app.py (same server settings as render.yaml)
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        limit_concurrency=256,
+        timeout_keep_alive=15,
+        access_log=False,
+        proxy_headers=True,
+    )
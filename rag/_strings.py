@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+rag/_strings.py
+
+String rendering shared by rag/answer.py (per-request fallback),
+rag/retrieve.py (per-row columns filled at load) and
+scripts/add_snippet_column.py (snippet column baked into the Parquet):
+- trim(): the one snippet-trimming implementation
+- labels(): the human-readable inline cite and source line of a row
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+# Snippet length in /answer prose; scripts/add_snippet_column.py can bake
+# the trimmed text into the Parquet as SNIPPET_COLUMN
+SNIPPET_CHARS = 500
+SNIPPET_COLUMN = f"text_trim{SNIPPET_CHARS}"
+
+_SENTENCE_ENDS = ".!?"
+_AFTER_SENTENCE = ("", " ", '"', "'", "\n")
+
+
+def trim(s: str, limit: int = 500, prefer_sentence: bool = False) -> str:
+    """
+    Cut `s` to at most `limit` chars (+ "…"), at the last space before the limit.
+    With prefer_sentence, end at the last complete sentence inside the limit
+    instead, when there is one (no "…" then).
+    All scans are forward str.rfind calls on the original string — no reversed
+    copies, no regex.
+    """
+    s = (s or "").strip()
+    if len(s) <= limit:
+        return s
+    if prefer_sentence:
+        end = max([s.rfind(p, 0, limit) for p in _SENTENCE_ENDS])
+        if end > 0 and s[end + 1 : end + 2] in _AFTER_SENTENCE:
+            return s[: end + 1]
+    i = s.rfind(" ", 0, limit)
+    return (s[:i] if i > 0 else s[:limit]) + "…"
+
+
+# ---------- citation labels (never show chunk numbers) ----------
+
+def safe_str(v) -> str:
+    return "" if v is None else str(v)
+
+
+def human_date(row: Dict) -> str:
+    # prefer published → date → recorded_date (already normalized upstream)
+    for k in ("published", "date", "recorded_date"):
+        val = row.get(k)
+        if val:
+            return str(val)
+    return ""
+
+
+def ts_url(row: Dict) -> Optional[str]:
+    """
+    Prefer precomputed ts_url if present; else compute if we have youtube_id & start_sec;
+    else fall back to plain url; else None.
+    """
+    if row.get("ts_url"):
+        return row["ts_url"]
+    yt = row.get("youtube_id")
+    ss = row.get("start_sec")
+    if yt and ss is not None:
+        try:
+            t = int(max(0, float(ss)))
+            return f"https://youtu.be/{yt}?t={t}"
+        except Exception:
+            return None
+    return row.get("url") or None
+
+
+def ts_bracket(row: Dict, link: Optional[str] = None) -> str:
+    """
+    Return markdown like: [00:54:17–00:54:44](https://youtu.be/ID?t=3257)
+    If we only have a start time, show just [00:54:17](...).
+    If no timing/link, return "".
+    Pass `link` when the caller already has ts_url(row), to skip recomputing it.
+    """
+    start = row.get("start_hhmmss")
+    if not start:
+        return ""
+    end = row.get("end_hhmmss")
+    if link is None:
+        link = ts_url(row)
+    if not link:
+        return ""
+    label = start if not end else f"{start}–{end}"
+    return f"[{label}]({link})"
+
+
+def human_title(row: Dict) -> str:
+    # Prefer archival_title, then citation, then talk_id
+    return safe_str(row.get("archival_title") or row.get("citation") or row.get("talk_id"))
+
+
+def labels(row: Dict) -> Tuple[str, str]:
+    """(inline cite, source line) — date/title/ts_url/bracket derived once.
+    rag/retrieve.py stores these per row as 'inline_cite' / 'source_line' at load."""
+    date = human_date(row)
+    title = human_title(row)
+    link = ts_url(row)
+    ts = ts_bracket(row, link) if link else ""
+
+    base = ", ".join([p for p in (date, title) if p])
+    cite = f"({base}, {ts})" if ts else f"({base})"
+    # Pick the final template per branch (no concatenated intermediates)
+    if ts:
+        line = f"— {date}, {title} · {ts}"
+    elif link:
+        line = f"— {date}, {title} · {link}"
+    else:
+        line = f"— {date}, {title}"
+    return cite, line
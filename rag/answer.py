@@ -10,73 +10,25 @@ Render a short, citation-grounded synthesis without exposing internal "chunk" id
 from __future__ import annotations
 from typing import Dict, List, Tuple, Optional
 
-# ---------- helpers ----------
-
-def _safe_str(v) -> str:
-    return "" if v is None else str(v)
+from rag._strings import SNIPPET_CHARS, SNIPPET_COLUMN, labels, safe_str, trim as _trim
 
-def _trim(s: str, limit: int = 500) -> str:
-    s = (s or "").strip()
-    if len(s) <= limit:
-        return s
-    cut = s[:limit].rsplit(" ", 1)[0]
-    return (cut or s[:limit]) + "…"
+# Source lines listed under an answer
+_MAX_SOURCES = 6
 
-def _human_date(row: Dict) -> str:
-    # prefer published → date → recorded_date (already normalized upstream)
-    for k in ("published", "date", "recorded_date"):
-        val = row.get(k)
-        if val:
-            return str(val)
-    return ""
-
-def _ts_url(row: Dict) -> Optional[str]:
-    """
-    Prefer precomputed ts_url if present; else compute if we have youtube_id & start_sec;
-    else fall back to plain url; else None.
-    """
-    if row.get("ts_url"):
-        return row["ts_url"]
-    yt = row.get("youtube_id")
-    ss = row.get("start_sec")
-    if yt and ss is not None:
-        try:
-            t = int(max(0, float(ss)))
-            return f"https://youtu.be/{yt}?t={t}"
-        except Exception:
-            return None
-    return row.get("url") or None
-
-def _ts_bracket(row: Dict) -> str:
-    """
-    Return markdown like: [00:54:17–00:54:44](https://youtu.be/ID?t=3257)
-    If we only have a start time, show just [00:54:17](...).
-    If no timing/link, return "".
-    """
-    start = row.get("start_hhmmss")
-    end = row.get("end_hhmmss")
-    link = _ts_url(row)
-    if not start or not link:
-        return ""
-    label = start if not end else f"{start}–{end}"
-    return f"[{label}]({link})"
-
-def _human_title(row: Dict) -> str:
-    # Prefer archival_title, then citation, then talk_id
-    return _safe_str(row.get("archival_title") or row.get("citation") or row.get("talk_id"))
+# ---------- helpers ----------
+# NOTE: keep these pure Python — do not @njit them. Numba's string support
+# (f-strings, str.join, rfind) is partial, compiles slowly, and isn't faster
+# at runtime; the per-row work is done once at load anyway (rag/retrieve.py).
 
-def _human_label(row: Dict, include_ts: bool = True) -> str:
+def _row_view(row: Dict) -> Tuple[str, str]:
     """
-    "YYYY-MM-DD, Title" plus optional timestamp bracket.
-    NEVER includes 'chunk'.
+    Precomputed (inline_cite, source_line) columns when the row carries them
+    (every Retriever row does); else labels() rendered from the row itself.
     """
-    date = _human_date(row)
-    title = _human_title(row)
-    base = ", ".join([p for p in (date, title) if p])
-    if include_ts:
-        ts = _ts_bracket(row)
-        return f"{base}, {ts}" if ts else base
-    return base
+    cite = row.get("inline_cite")
+    if cite is not None:
+        return cite, row["source_line"]
+    return labels(row)
 
 def _inline_cite(row: Dict) -> str:
     """
@@ -85,41 +37,34 @@ def _inline_cite(row: Dict) -> str:
       "(2023-01-06, LSD and the Mind of the Universe – S2S Podcast, [00:54:17–00:54:44](...))"
       "(2022-08-30, Psychedelics and Cosmological Exploration with Chris Bache – Reach Truth Podcast)"
     """
-    return f"({_human_label(row, include_ts=True)})"
+    return _row_view(row)[0]
 
-def _dedupe_sources(hits: List[Dict]) -> List[Dict]:
+def _source_key(h: Dict) -> Tuple[str, str]:
+    """(talk_id, start_hhmmss or url or archival_title) — a human-facing proxy for 'same source'."""
+    return (
+        safe_str(h.get("talk_id")),
+        safe_str(h.get("start_hhmmss") or h.get("url") or h.get("archival_title") or ""),
+    )
+
+def _dedupe_sources(hits: List[Dict], limit: Optional[int] = None) -> List[Dict]:
     """
-    De-duplicate sources while preserving order.
-    Key by (talk_id, start_hhmmss or url or archival_title) as a human-facing proxy.
+    De-duplicate sources while preserving order (first occurrence wins;
+    dicts keep insertion order and setdefault never overwrites).
+    Stops scanning once `limit` distinct sources are found.
     """
-    seen: set[Tuple[str, str]] = set()
-    out: List[Dict] = []
+    first: Dict[Tuple[str, str], Dict] = {}
     for h in hits:
-        talk = _safe_str(h.get("talk_id"))
-        key2 = _safe_str(h.get("start_hhmmss") or h.get("url") or h.get("archival_title") or "")
-        key = (talk, key2)
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append(h)
-    return out
+        if limit is not None and len(first) >= limit:
+            break
+        first.setdefault(_source_key(h), h)
+    return list(first.values())
 
-def format_sources(hits: List[Dict], limit: int = 6) -> str:
+def format_sources(hits: List[Dict], limit: int = _MAX_SOURCES) -> str:
     """
     Render a bullet list of sources with optional timestamped link.
     NO chunk numbers.
     """
-    items: List[str] = []
-    for h in _dedupe_sources(hits)[:limit]:
-        date = _human_date(h)
-        title = _human_title(h)
-        ts = _ts_bracket(h)
-        url = _ts_url(h) or ""
-        if ts:
-            items.append(f"— {date}, {title} · {ts}")
-        else:
-            items.append(f"— {date}, {title}" + (f" · {url}" if url else ""))
-    return "\n".join(items)
+    return "\n".join([_row_view(h)[1] for h in _dedupe_sources(hits, limit)])
 
 # ---------- main entry ----------
 
@@ -132,15 +77,16 @@ def answer_from_chunks(query: str, hits: List[Dict], max_snippets: int = 3) -> s
     if not hits:
         return "I don’t have sufficient context to answer. Try adding a date, venue, or specific term."
 
-    top = hits[:max_snippets]
-    snippets: List[str] = []
-    for h in top:
-        txt = _trim(h.get("text", ""), limit=500)
-        cite = _inline_cite(h)  # includes timestamp bracket when available
-        snippets.append(f"{txt} {cite}")
-
-    synthesis = "Based on the archived talks, here are the most relevant passages:"
-    body = " ".join(snippets)
-    sources_block = format_sources(hits)
-
-    return f"{synthesis} {body}\n\nSources:\n{sources_block}"
\ No newline at end of file
+    # String parts joined once at the end (no per-snippet or per-block
+    # intermediates); sources follow the same _dedupe_sources rule as format_sources
+    parts: List[str] = ["Based on the archived talks, here are the most relevant passages:"]
+    add_part = parts.extend
+    for h in hits[:max_snippets]:
+        # Prefer the snippet precomputed at load / bundle build time
+        get = h.get
+        txt = get(SNIPPET_COLUMN) or _trim(get("text", ""), limit=SNIPPET_CHARS)
+        add_part((" ", txt, " ", _row_view(h)[0]))  # cite includes timestamp bracket when available
+    parts.append("\n\nSources:")
+    for h in _dedupe_sources(hits, _MAX_SOURCES):
+        add_part(("\n", _row_view(h)[1]))
+    return "".join(parts)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+rag/batcher.py
+
+Micro-batching front end for Retriever: concurrent /search calls that arrive
+within a short window are pooled into ONE embeddings request and ONE FAISS
+search, then each caller gets its own (per-talk capped) slice of the results.
+
+Callers that already hold a query vector pass it via `vec=` and skip the
+embedding step. `lookup()` adds a `probe` hook (e.g. a semantic-cache lookup)
+that runs on the fresh query vector inside the same batch: a hit skips the
+FAISS search, so a query costs one batch window whether it hits or misses.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from openai import BadRequestError
+
+MAX_BATCH = int(os.getenv("BATCH_MAX_SIZE", "32"))                 # max queries pooled into one embedding/FAISS call
+MAX_WAIT_S = float(os.getenv("BATCH_MAX_WAIT_MS", "10")) / 1000.0  # how long the first query waits for company
+MAX_CONCURRENT_SEARCHES = int(os.getenv("BATCH_MAX_SEARCHES", "2"))  # FAISS searches allowed in flight at once
+
+# probe(vec) -> cached value, or None to fall through to the FAISS search
+Probe = Callable[[np.ndarray], Optional[Any]]
+
+# (query, precomputed 1×D vector or None, k, probe or None, future)
+_Item = Tuple[str, Optional[np.ndarray], int, Optional[Probe], "asyncio.Future[Any]"]
+
+
+class QueryCoalescer:
+    """
+    Parameters
+    ----------
+    retriever : Retriever
+        Loaded retriever (provides _aembed_queries, _index_search and _collect).
+    max_batch : int
+        Max queries per coalesced batch.
+    max_wait : float
+        Seconds to keep the batch window open after the first query arrives.
+    max_concurrent_searches : int
+        Cap on concurrent FAISS searches (protects the FAISS/OMP threads).
+    oversample_factor : int
+        Same meaning as in Retriever.search().
+    """
+
+    def __init__(
+        self,
+        retriever,
+        max_batch: int = MAX_BATCH,
+        max_wait: float = MAX_WAIT_S,
+        max_concurrent_searches: int = MAX_CONCURRENT_SEARCHES,
+        oversample_factor: int = 8,
+    ):
+        self.retriever = retriever
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.oversample_factor = oversample_factor
+        self._queue: asyncio.Queue[_Item] = asyncio.Queue()
+        self._faiss_slots = asyncio.Semaphore(max_concurrent_searches)
+        self._worker: Optional[asyncio.Task] = None
+        self._collecting: List[_Item] = []  # the window currently being filled by _run
+        self._inflight: Dict[asyncio.Task, List[_Item]] = {}
+        self._batches = 0
+        self._queries = 0
+
+    # ---------- Public API ----------
+
+    async def submit(self, query: str, k: int, vec: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Queue one query and wait for its share of the next batch."""
+        _, _, rows = await self._enqueue(query, vec, max(1, k), None)
+        return rows
+
+    async def lookup(
+        self, query: str, k: int, probe: Probe
+    ) -> Tuple[np.ndarray, Optional[Any], Optional[List[Dict[str, Any]]]]:
+        """Embed ``query`` in the next batch and call ``probe`` on its vector.
+
+        Returns ``(vec, hit, None)`` when the probe hits, else ``(vec, None, rows)``
+        with the search results; ``vec`` is the 1×D normalized query vector.
+        """
+        return await self._enqueue(query, None, max(1, k), probe)
+
+    async def aclose(self) -> None:
+        """Stop the background worker and cancel every caller still waiting:
+        queued, in the window being collected, or in a dispatched batch."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        pending = self._collecting
+        self._collecting = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for task, batch in list(self._inflight.items()):
+            task.cancel()
+            pending.extend(batch)
+        self._inflight.clear()
+        for *_, fut in pending:
+            fut.cancel()  # no-op for futures that already have a result
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "batches": self._batches,
+            "queries": self._queries,
+            "avg_batch_size": round(self._queries / self._batches, 2) if self._batches else None,
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+    # ---------- Worker ----------
+
+    async def _enqueue(self, query: str, vec: Optional[np.ndarray], k: int, probe: Optional[Probe]) -> Any:
+        self._ensure_worker()
+        fut: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, vec, k, probe, fut))
+        return await fut
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without blocking the next window from filling up.
+            self._collecting = []
+            task = loop.create_task(self._dispatch(batch))
+            self._inflight[task] = batch
+            task.add_done_callback(lambda t: self._inflight.pop(t, None))
+
+    async def _embed_isolated(
+        self, texts: List[str]
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, BaseException]]:
+        """Embed ``texts`` in one call; if the API rejects the input (400),
+        retry each text alone so a single bad input only fails its own callers.
+        Any other error (429, timeout, 5xx) propagates and fails the batch:
+        fanning it out would only multiply the load on a struggling API."""
+        if not texts:
+            return {}, {}
+        try:
+            qm = await self.retriever._aembed_queries(texts)
+            return {q: qm[i : i + 1] for i, q in enumerate(texts)}, {}
+        except BadRequestError as e:
+            if len(texts) == 1:
+                return {}, {texts[0]: e}
+        rows = await asyncio.gather(
+            *(self.retriever._aembed_queries([q]) for q in texts), return_exceptions=True
+        )
+        vec_of: Dict[str, np.ndarray] = {}
+        err_of: Dict[str, BaseException] = {}
+        for q, r in zip(texts, rows):
+            if isinstance(r, BaseException):
+                err_of[q] = r
+            else:
+                vec_of[q] = r[0:1]
+        return vec_of, err_of
+
+    async def _dispatch(self, batch: List[_Item]) -> None:
+        live = [item for item in batch if not item[4].done()]
+        if not live:
+            return
+        self._batches += 1
+        self._queries += len(live)
+
+        try:
+            # Identical queries in the same window share one embedding row.
+            texts = list(dict.fromkeys(q for q, v, _, _, _ in live if v is None))
+            vec_of, err_of = await self._embed_isolated(texts)
+            searches = []
+            for q, v, k, probe, fut in live:
+                if fut.done():
+                    continue
+                if v is None and q in err_of:
+                    fut.set_exception(err_of[q])
+                    continue
+                vec = v if v is not None else vec_of[q]
+                hit = probe(vec) if probe is not None else None
+                if hit is not None:
+                    fut.set_result((vec, hit, None))
+                else:
+                    searches.append((vec, k, fut))
+
+            if searches:
+                qm = np.vstack([vec for vec, _, _ in searches])
+                k_max = max(k for _, k, _ in searches)
+                nprobe = max(k_max * self.oversample_factor, k_max)
+                async with self._faiss_slots:
+                    scores, ids = await asyncio.to_thread(self.retriever._index_search, qm, nprobe)
+        except Exception as e:
+            for *_, fut in live:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for i, (vec, k, fut) in enumerate(searches):
+            if fut.done():
+                continue
+            try:
+                fut.set_result((vec, None, self.retriever._collect(ids[i], scores[i], k)))
+            except Exception as e:
+                fut.set_exception(e)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+rag/cache.py
+
+Two-tier response cache for /search and /answer.
+- Exact tier: sha256(kind|query|variant) → response, O(1) dict hit.
+- Semantic tier: cosine-NN over recent query vectors; a hit (sim ≥ threshold)
+  returns the response stored for the near-duplicate query.
+
+Query vectors are the same L2-normalized embeddings the retriever searches
+with, so a semantic miss costs nothing extra: the caller reuses the vector
+for the FAISS search.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+
+CACHE_MAXSIZE   = int(os.getenv("CACHE_MAXSIZE", "4096"))
+CACHE_TTL_S     = int(os.getenv("CACHE_TTL_S", "3600"))
+CACHE_THRESHOLD = float(os.getenv("CACHE_THRESHOLD", "0.95"))
+SEMANTIC_SLOTS  = int(os.getenv("CACHE_SEMANTIC_SLOTS", "1024"))
+
+
+def _key(kind: str, query: str, variant: Any) -> str:
+    return hashlib.sha256(f"{kind}|{query.strip()}|{variant}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Parameters
+    ----------
+    maxsize : int
+        Max exact-tier entries (LRU + TTL eviction).
+    ttl : int
+        Seconds an entry stays valid; applies to both tiers.
+    threshold : float
+        Cosine similarity required for a semantic hit.
+    semantic_slots : int
+        Number of recent query vectors kept for the semantic tier (ring buffer).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = CACHE_MAXSIZE,
+        ttl: int = CACHE_TTL_S,
+        threshold: float = CACHE_THRESHOLD,
+        semantic_slots: int = SEMANTIC_SLOTS,
+    ):
+        self.threshold = threshold
+        self._exact: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Semantic tier: slot i holds a query vector + the exact key it maps to.
+        # Values live only in the exact tier, so TTL/LRU eviction covers both.
+        self._slots = semantic_slots
+        self._vecs: Optional[np.ndarray] = None
+        self._slot_meta: List[Optional[Tuple[str, Any, str]]] = [None] * semantic_slots
+        self._next = 0
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    # ---------- Lookups ----------
+
+    def get(self, kind: str, query: str, variant: Any) -> Optional[Any]:
+        """Exact tier only; no embedding needed."""
+        hit = self._exact.get(_key(kind, query, variant))
+        if hit is not None:
+            self._stats["exact_hits"] += 1
+        return hit
+
+    def get_similar(self, kind: str, variant: Any, vec: np.ndarray) -> Optional[Any]:
+        """Semantic tier: best stored query of the same kind/variant with cosine ≥ threshold."""
+        if self._vecs is not None:
+            sims = self._vecs @ vec.reshape(-1)
+            for i in np.argsort(-sims):
+                if sims[i] < self.threshold:
+                    break
+                meta = self._slot_meta[i]
+                if meta is None or meta[0] != kind or meta[1] != variant:
+                    continue
+                hit = self._exact.get(meta[2])
+                if hit is not None:
+                    self._stats["semantic_hits"] += 1
+                    return hit
+        self._stats["misses"] += 1
+        return None
+
+    # ---------- Stores ----------
+
+    def put(self, kind: str, query: str, variant: Any, value: Any, vec: Optional[np.ndarray] = None) -> None:
+        key = _key(kind, query, variant)
+        self._exact[key] = value
+        if vec is None or self._slots <= 0:
+            return
+        v = np.asarray(vec, dtype=np.float32).reshape(-1)
+        if self._vecs is None:
+            self._vecs = np.zeros((self._slots, v.shape[0]), dtype=np.float32)
+        i = self._next
+        self._vecs[i] = v
+        self._slot_meta[i] = (kind, variant, key)
+        self._next = (i + 1) % self._slots
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "entries": len(self._exact),
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+rag/embed_local.py
+
+Optional in-process query encoder (ONNX Runtime + HF tokenizers), used by
+Retriever when EMBED_BACKEND=local instead of the OpenAI embeddings API.
+
+The FAISS index must be built with the same model
+(scripts/build_index.py --embed-backend local), since its dimension and
+vector space differ from text-embedding-3-large.
+
+Requirements (only for EMBED_BACKEND=local):
+  pip install onnxruntime tokenizers
+  + an exported encoder, e.g. bge-small-en-v1.5 (int8-quantized model.onnx + tokenizer.json)
+"""
+
+from __future__ import annotations
+
+import os
+from typing import List
+
+import numpy as np
+
+EMBED_ONNX_PATH      = os.getenv("EMBED_ONNX_PATH", "models/bge-small-en-v1.5/model_quantized.onnx")
+EMBED_TOKENIZER_PATH = os.getenv("EMBED_TOKENIZER_PATH", "models/bge-small-en-v1.5/tokenizer.json")
+EMBED_MAX_TOKENS     = int(os.getenv("EMBED_MAX_TOKENS", "512"))
+EMBED_POOLING        = os.getenv("EMBED_POOLING", "cls")  # cls (bge) | mean
+# ORT intra-op threads; 0 = half the CPUs this process may run on, counted like
+# FAISS_THREADS in rag/retrieve.py (honours container cpusets, unlike cpu_count)
+_CPUS                = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 2)
+EMBED_THREADS        = int(os.getenv("EMBED_THREADS", "0")) or max(1, _CPUS // 2)
+
+_INT_DTYPES = {"tensor(int64)": np.int64, "tensor(int32)": np.int32}
+
+
+class LocalEmbedder:
+    """
+    Parameters
+    ----------
+    model_path : str
+        ONNX encoder whose first output is last_hidden_state (B×T×D).
+    tokenizer_path : str
+        HF `tokenizers` JSON matching the model.
+    max_tokens : int
+        Truncation length.
+    pooling : str
+        "cls" (first token, bge-style) or "mean" (attention-masked mean).
+    threads : int
+        ONNX Runtime intra-op threads.
+    """
+
+    def __init__(
+        self,
+        model_path: str = EMBED_ONNX_PATH,
+        tokenizer_path: str = EMBED_TOKENIZER_PATH,
+        max_tokens: int = EMBED_MAX_TOKENS,
+        pooling: str = EMBED_POOLING,
+        threads: int = EMBED_THREADS,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if pooling not in ("cls", "mean"):
+            raise RuntimeError(f"EMBED_POOLING must be 'cls' or 'mean', got {pooling!r}")
+        self.model_path = model_path
+        self.pooling = pooling
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input_dtypes = {i.name: _INT_DTYPES.get(i.type, np.int64) for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_tokens)
+        self.tokenizer.enable_padding()
+
+        self.dim = int(self.embed(["dimension probe"]).shape[1])
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return an N×D float32 matrix (not normalized; Retriever normalizes)."""
+        enc = self.tokenizer.encode_batch(list(texts))
+        ids = np.asarray([e.ids for e in enc])
+        mask = np.asarray([e.attention_mask for e in enc])
+        feed = {}
+        for name, dt in self._input_dtypes.items():
+            if name == "input_ids":
+                feed[name] = ids.astype(dt, copy=False)
+            elif name == "attention_mask":
+                feed[name] = mask.astype(dt, copy=False)
+            elif name == "token_type_ids":
+                feed[name] = np.zeros_like(ids, dtype=dt)
+        hidden = self.session.run(None, feed)[0]
+
+        if self.pooling == "cls":
+            out = hidden[:, 0]
+        else:
+            m = mask[..., None].astype(np.float32)
+            out = (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1.0)
+        return np.ascontiguousarray(out, dtype=np.float32)
@@ -7,36 +7,179 @@ metadata table. Supports human-readable citations that were embedded by
 tools/embed_and_faiss.py (columns: citation, date, venue, url, transcript_path).
 
 Requirements:
-  pip install "openai==1.*" faiss-cpu numpy pandas pyarrow python-dotenv
+  pip install "openai==1.*" faiss-cpu numpy pyarrow python-dotenv
   export OPENAI_API_KEY="sk-..."
+  (EMBED_BACKEND=local instead embeds queries in-process, see rag/embed_local.py)
 """
 
 from __future__ import annotations
 
+import asyncio
+import base64
 import os
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
 import faiss
 import numpy as np
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from rag._strings import SNIPPET_CHARS, SNIPPET_COLUMN, labels as _labels, trim as _trim
 
 load_dotenv()
 
 FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", "vectors/bache-talks.index.faiss")
 METADATA_PATH    = os.getenv("METADATA_PATH",     "vectors/bache-talks.embeddings.parquet")
 EMBED_MODEL      = os.getenv("EMBED_MODEL",       "text-embedding-3-large")
+EMBED_BACKEND    = os.getenv("EMBED_BACKEND",     "openai")  # openai | local
 PER_TALK_CAP     = int(os.getenv("MAX_PER_TALK",  "3"))
 TOP_K_DEFAULT    = int(os.getenv("TOP_K_DEFAULT", "8"))
+OPENAI_TIMEOUT   = float(os.getenv("OPENAI_TIMEOUT", "30"))
+FAISS_MMAP       = os.getenv("FAISS_MMAP", "1") == "1"
+FAISS_NPROBE     = int(os.getenv("FAISS_NPROBE", "16"))
+# OMP threads per FAISS search; 0 = half the CPUs this process may run on
+# (≈ physical cores under SMT; honours container cpusets, unlike cpu_count), so
+# the few searches the API runs concurrently (via asyncio.to_thread) don't
+# oversubscribe the CPU
+_CPUS            = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 2)
+FAISS_THREADS    = int(os.getenv("FAISS_THREADS", "0")) or max(1, _CPUS // 2)
+FAISS_GPU        = os.getenv("FAISS_GPU", "0") == "1"  # copy the index to GPU 0 (needs faiss-gpu + CUDA)
+# Query-embedding cache (exact text, per model); 0 disables
+EMBED_CACHE_SIZE  = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+EMBED_CACHE_TTL_S = int(os.getenv("EMBED_CACHE_TTL_S", "3600"))
+
+
+# Columns returned per hit (missing columns come back as None)
+_ROW_COLUMNS = [
+    # Core retrieval info
+    "id", "text", "talk_id", "archival_title", "chunk_index", "published",
+    "channel", "source_type",
+    "text_trim500",  # optional, see scripts/add_snippet_column.py (else trimmed at load)
+    # Human-readable citation metadata
+    "citation", "date", "venue", "url", "transcript_path",
+    # Timing
+    "youtube_id", "start_sec", "end_sec", "start_hhmmss", "end_hhmmss",
+    "source_used",   # captions|diarist
+    "method",        # exact|fuzzy
+    "confidence",
+]
+
+
+# Served dtypes, pinned at load so every hit carries the same Python types
+# whatever the bundle wrote (e.g. chunk_index as double) — everything else is string
+_COLUMN_TYPES = {
+    "id": pa.int64(), "chunk_index": pa.int64(),
+    "start_sec": pa.float64(), "end_sec": pa.float64(), "confidence": pa.float64(),
+}
+
+# Per-hit output columns (ts_url, recorded_date, citation_payload and the
+# /answer inline_cite/source_line strings are derived at load)
+_OUT_COLUMNS = _ROW_COLUMNS + ["ts_url", "recorded_date", "citation_payload", "inline_cite", "source_line"]
+_LOAD_DERIVED = ("citation_payload", "inline_cite", "source_line")
+
+
+def _null_if(col: pa.ChunkedArray, mask: pa.ChunkedArray) -> pa.ChunkedArray:
+    return pc.if_else(mask, pa.scalar(None, col.type), col)
+
+
+def _sanitize(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    """±inf/NaN → null in float columns (nulls become None in the row dicts)."""
+    if pa.types.is_floating(col.type):
+        return _null_if(col, pc.or_(pc.is_nan(col), pc.is_inf(col)))
+    return col
+
+
+def _pin(col: pa.ChunkedArray, typ: pa.DataType) -> pa.ChunkedArray:
+    """Safe cast to the served dtype; a column that can't be cast losslessly is kept as is."""
+    if col.type == typ:
+        return col
+    try:
+        return pc.cast(col, typ)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return col
+
+
+def _ts_url_column(t: pa.Table) -> pa.ChunkedArray:
+    """Timestamped YouTube link when timing is known, else the plain url (Arrow compute)."""
+    ss = pc.cast(t["start_sec"], pa.float64())
+    # skip_nulls=False: a null start_sec must stay null (→ plain url), not become max(null, 0) = 0
+    secs = pc.cast(pc.cast(pc.trunc(pc.max_element_wise(ss, 0.0, skip_nulls=False)), pa.int64()), pa.string())
+    yt = pc.cast(t["youtube_id"], pa.string())
+    yt = _null_if(yt, pc.equal(yt, ""))
+    linked = pc.binary_join_element_wise("https://youtu.be/", yt, "?t=", secs, "")  # null if either is null
+    ts_url = pc.if_else(pc.is_valid(linked), linked, t["url"])
+    return _null_if(ts_url, pc.equal(ts_url, ""))
+
+
+def _citation_payload_column(cols: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Per-row /answer citation dict (app.Citation's fields), built once from the
+    sanitized columns. ts_url is kept only when it is a timestamped link.
+    """
+    out = np.empty(len(cols["talk_id"]), dtype=object)
+    for i, (t, title, rd, pub, ci, cit, url, hh, ts, yt, ss) in enumerate(zip(
+        cols["talk_id"], cols["archival_title"], cols["recorded_date"], cols["published"],
+        cols["chunk_index"], cols["citation"], cols["url"], cols["start_hhmmss"],
+        cols["ts_url"], cols["youtube_id"], cols["start_sec"],
+    )):
+        out[i] = {
+            "talk_id": str(t or ""),
+            "archival_title": str(title or ""),
+            "recorded_date": rd,
+            "published": pub,
+            "chunk_index": int(ci or 0),
+            "citation": cit,
+            "url": url,
+            "start_hhmmss": hh,
+            "ts_url": ts if yt and ss is not None else None,
+        }
+    return out
+
+
+def _snippet_column(cols: Dict[str, np.ndarray]) -> np.ndarray:
+    """/answer snippet per row: the baked column where present, else rag._strings.trim once here."""
+    out = cols[SNIPPET_COLUMN].copy()
+    for i in np.flatnonzero(out == None).tolist():  # noqa: E711 (elementwise on object array)
+        out[i] = _trim(cols["text"][i] or "", limit=SNIPPET_CHARS)
+    return out
 
 
-def _l2_normalize_rows(mat: np.ndarray) -> np.ndarray:
-    """Row-wise L2 normalize (with 0-safe guard)."""
-    norms = np.linalg.norm(mat, axis=1, keepdims=True)
-    norms[norms == 0.0] = 1.0
-    return mat / norms
+def _answer_label_columns(cols: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row /answer inline cite and source line, rendered once by rag._strings.labels."""
+    n = len(cols["talk_id"])
+    cites, lines = np.empty(n, dtype=object), np.empty(n, dtype=object)
+    for i, vals in enumerate(zip(*cols.values())):
+        cites[i], lines[i] = _labels(dict(zip(cols, vals)))
+    return cites, lines
+
+
+def _recorded_date_column(t: pa.Table) -> pa.ChunkedArray:
+    """First non-empty of published → date, as str (Arrow compute)."""
+    cols = [pc.cast(t[c], pa.string()) for c in ("published", "date")]
+    return pc.coalesce(*[_null_if(c, pc.equal(c, "")) for c in cols])
+
+
+def _object_array(col: pa.ChunkedArray) -> np.ndarray:
+    """Arrow column → NumPy object array of Python scalars (null → None)."""
+    out = np.empty(len(col), dtype=object)
+    out[:] = col.to_pylist()
+    return out
+
+
+def _normalize_inplace(mat: np.ndarray) -> np.ndarray:
+    """
+    Row-wise L2 normalize in place with FAISS's SIMD kernel (zero rows are left
+    as is); returns `mat`, or a contiguous float32 copy if it wasn't one already.
+    """
+    if mat.dtype != np.float32 or not mat.flags.c_contiguous:
+        mat = np.ascontiguousarray(mat, dtype=np.float32)
+    faiss.normalize_L2(mat)
+    return mat
 
 
 class Retriever:
@@ -48,11 +191,14 @@ class Retriever:
     faiss_path : str
         FAISS index path (IndexIDMap2 over IndexFlatIP recommended; positional fallback supported)
     model : str
-        OpenAI embedding model for query vectors.
+        OpenAI embedding model for query vectors (EMBED_BACKEND=openai).
     per_talk_cap : int
         Max number of hits per talk.
     top_k_default : int
         Default K when not specified in .search()
+    aclient : AsyncOpenAI, optional
+        Shared async client (e.g. the app's pooled HTTP/2 client). If omitted,
+        the retriever creates its own.
     """
 
     def __init__(
@@ -62,6 +208,7 @@ class Retriever:
         model: str = EMBED_MODEL,
         per_talk_cap: int = PER_TALK_CAP,
         top_k_default: int = TOP_K_DEFAULT,
+        aclient: Optional[AsyncOpenAI] = None,
     ):
         self.parquet_path = parquet_path
         self.faiss_path = faiss_path
@@ -69,121 +216,279 @@ class Retriever:
         self.per_talk_cap = per_talk_cap
         self.top_k_default = top_k_default
 
-        # Load Parquet → pandas
-        table = pq.read_table(parquet_path)
-        df = table.to_pandas()
-
-        if "embedding" not in df.columns:
+        # Load Parquet as Arrow straight off the memory map (only the columns
+        # served per hit; the 'embedding' column is already baked into the
+        # FAISS index). No pandas: derived columns use Arrow compute.
+        pf = pq.ParquetFile(parquet_path, memory_map=True)
+        names = pf.schema_arrow.names
+        if "embedding" not in names:
             raise RuntimeError("Parquet is missing 'embedding' column.")
-        if "id" not in df.columns:
-            df["id"] = np.arange(len(df), dtype=np.int64)  # back-compat
-
-        self.df = df.reset_index(drop=True)
-        self.df_by_id = self.df.set_index("id", drop=False)
-
-        # Load FAISS index
-        self.index = faiss.read_index(faiss_path)
-
-        # OpenAI client
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError("OPENAI_API_KEY not set.")
-        self.client = OpenAI(api_key=api_key)
-
-        # Infer embedding dim from first row
+        table = pf.read(columns=[c for c in _ROW_COLUMNS if c in names], use_threads=True)
+        self.n_rows = n = int(table.num_rows)
+        if "id" not in names:
+            table = table.append_column("id", pa.array(np.arange(n, dtype=np.int64)))  # back-compat
+        for c in _ROW_COLUMNS:
+            if c not in table.column_names:
+                table = table.append_column(c, pa.nulls(n, _COLUMN_TYPES.get(c, pa.string())))
+
+        # Sanitize once at load (±inf/NaN → None, pinned dtypes, Arrow → Python
+        # scalars) and precompute ts_url/recorded_date, so per-hit formatting is
+        # plain array lookups.
+        table = pa.table({c: _pin(_sanitize(table[c]), _COLUMN_TYPES.get(c, pa.string())) for c in _ROW_COLUMNS})
+        derived = {"ts_url": _ts_url_column(table), "recorded_date": _recorded_date_column(table)}
+
+        # Struct-of-arrays store: one object array per served column
+        self.cols: Dict[str, np.ndarray] = {
+            c: _object_array(table[c] if c in table.column_names else derived[c])
+            for c in _OUT_COLUMNS if c not in _LOAD_DERIVED
+        }
+        self.cols[SNIPPET_COLUMN] = _snippet_column(self.cols)
+        self.cols["citation_payload"] = _citation_payload_column(self.cols)
+        self.cols["inline_cite"], self.cols["source_line"] = _answer_label_columns(self.cols)
+        # Prebuilt per-row records (values shared with self.cols); hits are
+        # shallow copies, so formatting a row is one C-level dict copy
+        self._records: List[Dict[str, Any]] = [dict(zip(self.cols, vals)) for vals in zip(*self.cols.values())]
+        # Integer talk codes for the vectorized per-talk cap (-1 = no talk_id)
+        codes = pc.dictionary_encode(table["talk_id"]).combine_chunks().indices
+        self._talk_codes = pc.fill_null(codes, -1).to_numpy().astype(np.int32)
+
+        # FAISS label → row position lookup table (IDMap labels == 'id' column)
+        self._label_lut: Optional[np.ndarray] = None
         try:
-            first = self.df.iloc[0]["embedding"]
-            self.embed_dim = int(len(first))
+            if table["id"].null_count:
+                raise ValueError("null ids")
+            labels = pc.cast(table["id"], pa.int64()).to_numpy()
+            if len(labels) and labels.min() >= 0 and labels.max() < 4 * len(labels) + 1024:
+                lut = np.full(int(labels.max()) + 1, -1, dtype=np.int64)
+                lut[labels[::-1]] = np.arange(len(labels) - 1, -1, -1)  # first row wins
+                self._label_lut = lut
+        except (TypeError, ValueError):
+            pass
+
+        # "talk_id:chunk_index" → row position, for get_by_ids()
+        self._key_index: Dict[str, int] = {}
+        for pos, (t, c) in enumerate(zip(self.cols["talk_id"].tolist(), self.cols["chunk_index"].tolist())):
+            if t is not None and c is not None:
+                self._key_index.setdefault(f"{t}:{c}", pos)
+
+        faiss.omp_set_num_threads(FAISS_THREADS)
+
+        # Load FAISS index (mmap'd read-only: pages come from the OS page
+        # cache and are shared between worker processes)
+        self.faiss_mmap = FAISS_MMAP
+        self.faiss_mmap_error: Optional[str] = None
+        if FAISS_MMAP:
+            # IO_FLAG_MMAP_IFC (faiss ≥ 1.8) maps flat codes and IVF lists in place;
+            # combining it with IO_FLAG_MMAP makes IVF reads fail
+            flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+            try:
+                self.index = faiss.read_index(faiss_path, flags)
+            except RuntimeError as e:
+                # Index types FAISS can't map (see faiss_mmap_error in status) load into RAM
+                self.faiss_mmap, self.faiss_mmap_error = False, str(e).strip().splitlines()[-1][:200]
+        if not self.faiss_mmap:
+            self.index = faiss.read_index(faiss_path)
+
+        # IVF indexes (scripts/build_index.py): lists probed per query.
+        # Flat indexes have no nprobe and are searched exhaustively.
+        try:
+            self.nprobe: Optional[int] = FAISS_NPROBE
+            faiss.extract_index_ivf(self.index).nprobe = FAISS_NPROBE
+        except RuntimeError:
+            self.nprobe = None
+
+        # Optional GPU copy (nprobe above is carried over by the cloner). The
+        # resources object must outlive the index, so it is kept on self.
+        # Like mmap, a failure falls back to the CPU index (see status).
+        # GPU indexes and StandardGpuResources are not thread-safe, even for
+        # search, so _index_search serializes on _gpu_lock when faiss_gpu is set.
+        self._gpu_res = None
+        self._gpu_lock = threading.Lock()
+        self.faiss_gpu = False
+        self.faiss_gpu_error: Optional[str] = None
+        if FAISS_GPU:
+            if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() < 1:
+                self.faiss_gpu_error = "no usable GPU in this faiss build (install faiss-gpu)"
+            else:
+                try:
+                    self._gpu_res = faiss.StandardGpuResources()
+                    self.index = faiss.index_cpu_to_gpu(self._gpu_res, 0, self.index)
+                    self.faiss_gpu = True
+                except RuntimeError as e:
+                    self._gpu_res = None
+                    self.faiss_gpu_error = str(e).strip().splitlines()[-1][:200]
+
+        # Embedding dim comes from the index itself
+        try:
+            self.embed_dim = int(self.index.d)
         except Exception:
             self.embed_dim = None
 
+        self.backend = EMBED_BACKEND
+        self.local = None
+        if self.backend == "local":
+            # In-process encoder; the index must be built with the same model
+            from rag.embed_local import LocalEmbedder
+
+            self.local = LocalEmbedder()
+            self.model = os.path.basename(self.local.model_path)
+            if self.embed_dim is not None and self.local.dim != self.embed_dim:
+                raise RuntimeError(
+                    f"Local encoder dim {self.local.dim} != FAISS index dim {self.embed_dim}; "
+                    "rebuild the index with scripts/build_index.py --embed-backend local"
+                )
+            self.client = self.aclient = None
+        elif self.backend == "openai":
+            # OpenAI clients (sync for scripts/smoke tests, async for the API routes)
+            api_key = os.environ.get("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError("OPENAI_API_KEY not set.")
+            self.client = OpenAI(api_key=api_key)
+            self.aclient = aclient or AsyncOpenAI(api_key=api_key, timeout=OPENAI_TIMEOUT, max_retries=2)
+        else:
+            raise RuntimeError(f"EMBED_BACKEND must be 'openai' or 'local', got {self.backend!r}")
+
+        # (model, query text) → read-only D-vector; repeated queries skip the
+        # embedding call. Locked: sync embeds can run in worker threads.
+        self._qcache: Optional[TTLCache] = (
+            TTLCache(maxsize=EMBED_CACHE_SIZE, ttl=EMBED_CACHE_TTL_S) if EMBED_CACHE_SIZE > 0 else None
+        )
+        self._qcache_lock = threading.Lock()
+        self._qcache_stats = {"hits": 0, "misses": 0}
+
     # ---------- Query embedding ----------
 
     def _embed_query(self, query: str) -> np.ndarray:
         """Return a 1×D L2-normalized vector for cosine/IP search (NumPy 2.x safe)."""
-        resp = self.client.embeddings.create(model=self.model, input=[query])
-        arr = np.asarray(resp.data[0].embedding, dtype=np.float32)
-        vec = arr.reshape(1, -1)
-        return _l2_normalize_rows(vec)
-
-    # ---------- Row helpers ----------
+        return self._embed_queries([query])
+
+    async def _aembed_query(self, query: str) -> np.ndarray:
+        """Async twin of _embed_query(); awaits the embedding call on the event loop."""
+        return await self._aembed_queries([query])
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed N queries (cache misses in a single request); returns an N×D L2-normalized float32 matrix."""
+        cached, missing = self._cache_lookup(queries)
+        mat = self._embed_uncached(missing) if missing else None
+        return self._cache_merge(queries, cached, missing, mat)
+
+    async def _aembed_queries(self, queries: List[str]) -> np.ndarray:
+        """Async twin of _embed_queries()."""
+        cached, missing = self._cache_lookup(queries)
+        mat = None
+        if missing:
+            if self.local is not None:
+                # CPU-bound; ONNX Runtime releases the GIL
+                mat = await asyncio.to_thread(self._embed_uncached, missing)
+            else:
+                resp = await self.aclient.embeddings.create(model=self.model, input=missing, encoding_format="base64")
+                mat = self._stack_embeddings(resp)
+        return self._cache_merge(queries, cached, missing, mat)
+
+    def _embed_uncached(self, queries: List[str]) -> np.ndarray:
+        if self.local is not None:
+            return _normalize_inplace(self.local.embed(queries))
+        resp = self.client.embeddings.create(model=self.model, input=list(queries), encoding_format="base64")
+        return self._stack_embeddings(resp)
+
+    def _cache_lookup(self, queries: List[str]) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+        """Cached vector per query (None = miss), plus the distinct missed queries in order."""
+        if self._qcache is None:
+            return [None] * len(queries), list(dict.fromkeys(queries))
+        with self._qcache_lock:
+            cached = [self._qcache.get((self.model, q)) for q in queries]
+        missing = list(dict.fromkeys(q for q, v in zip(queries, cached) if v is None))
+        self._qcache_stats["hits"] += len(queries) - sum(v is None for v in cached)
+        self._qcache_stats["misses"] += len(missing)
+        return cached, missing
+
+    def _cache_merge(
+        self,
+        queries: List[str],
+        cached: List[Optional[np.ndarray]],
+        missing: List[str],
+        mat: Optional[np.ndarray],
+    ) -> np.ndarray:
+        """Store freshly embedded rows and assemble the N×D result in query order."""
+        if mat is not None and self._qcache is not None:
+            with self._qcache_lock:
+                for i, q in enumerate(missing):
+                    v = mat[i].copy()
+                    v.flags.writeable = False
+                    self._qcache[(self.model, q)] = v
+        if mat is not None and len(missing) == len(queries):
+            return mat  # all misses, no duplicates: already in query order
+        row_of = {q: i for i, q in enumerate(missing)}
+        out = np.empty((len(queries), (mat if mat is not None else cached[0]).shape[-1]), dtype=np.float32)
+        for i, (q, v) in enumerate(zip(queries, cached)):
+            out[i] = v if v is not None else mat[row_of[q]]
+        return out
 
-    def _row_from_faiss_id(self, fid: int) -> pd.Series:
+    @staticmethod
+    def _stack_embeddings(resp) -> np.ndarray:
         """
-        If index uses IDMap labels that match df['id'], resolve by id.
-        Fallback: treat label as positional index.
+        Stack an embeddings response (in input order) into an N×D normalized matrix.
+        Requests ask for encoding_format="base64", so each row is raw little-endian
+        float32 decoded with np.frombuffer (the SDK would otherwise decode it into
+        a list of 3072 Python floats); float lists are still accepted.
         """
-        try:
-            return self.df_by_id.loc[int(fid)]
-        except Exception:
-            return self.df.iloc[int(fid)]
-
-    def _format_row(self, row: pd.Series, score: float) -> Dict[str, Any]:
-        """Return a clean dict with core + human-readable + timing fields; includes ts_url."""
-        def _clean(v):
-            # unwrap numpy scalar
-            if hasattr(v, "item"):
-                try:
-                    v = v.item()
-                except Exception:
-                    pass
-            # pandas/NumPy NA → None
-            try:
-                if pd.isna(v):
-                    return None
-            except Exception:
-                pass
-            # normalize dtypes
-            if isinstance(v, (np.floating,)):
-                v = float(v)
-            elif isinstance(v, (np.integer,)):
-                v = int(v)
-            # NaN/Inf guard
-            if isinstance(v, float) and (np.isnan(v) or np.isinf(v)):
-                return None
-            return v
-
-        def _ts_url(youtube_id, start_sec, fallback_url):
-            try:
-                if youtube_id is not None and start_sec is not None and not np.isnan(float(start_sec)):
-                    return f"https://youtu.be/{youtube_id}?t={int(max(0, float(start_sec)))}"
-            except Exception:
-                pass
-            return fallback_url or None
+        rows = [
+            np.frombuffer(base64.b64decode(e), dtype="<f4") if isinstance(e, str) else e
+            for e in (d.embedding for d in sorted(resp.data, key=lambda d: d.index))
+        ]
+        mat = np.empty((len(rows), len(rows[0]) if rows else 0), dtype=np.float32)
+        for i, r in enumerate(rows):
+            mat[i] = r
+        return _normalize_inplace(mat)
+
+    def _index_search(self, qm: np.ndarray, k: int):
+        """index.search with FAISS_THREADS applied first: OMP thread counts are per calling thread."""
+        faiss.omp_set_num_threads(FAISS_THREADS)
+        if self.faiss_gpu:
+            with self._gpu_lock:
+                return self.index.search(qm, k)
+        return self.index.search(qm, k)
+
+    def warmup(self) -> None:
+        """
+        One throwaway search on a zero vector: starts the OMP thread pool and
+        faults in the mmap'd index pages (all of a flat index; centroids and
+        probed lists of an IVF one) without needing an embedding call.
+        """
+        self._index_search(np.zeros((1, self.index.d), dtype=np.float32), 1)
 
-        youtube_id = row.get("youtube_id")
-        start_sec  = row.get("start_sec")
+    # ---------- Row helpers ----------
 
-        return {
-            # Core retrieval info
-            "id": _clean(row.get("id")),
-            "_score": _clean(score),
-            "text": _clean(row.get("text")),
-            "talk_id": _clean(row.get("talk_id")),
-            "archival_title": _clean(row.get("archival_title")),
-            "chunk_index": _clean(row.get("chunk_index")),
-            "published": _clean(row.get("published")),
-            "channel": _clean(row.get("channel")),
-            "source_type": _clean(row.get("source_type")),
-
-            # Human-readable citation metadata
-            "citation": _clean(row.get("citation")),
-            "date": _clean(row.get("date")),
-            "venue": _clean(row.get("venue")),
-            "url": _clean(row.get("url")),
-            "transcript_path": _clean(row.get("transcript_path")),
-
-            # Timing
-            "youtube_id": _clean(youtube_id),
-            "start_sec": _clean(start_sec),
-            "end_sec": _clean(row.get("end_sec")),
-            "start_hhmmss": _clean(row.get("start_hhmmss")),
-            "end_hhmmss": _clean(row.get("end_hhmmss")),
-            "source_used": _clean(row.get("source_used")),   # captions|diarist
-            "method": _clean(row.get("method")),             # exact|fuzzy
-            "confidence": _clean(row.get("confidence")),
-            "ts_url": _clean(_ts_url(youtube_id, start_sec, row.get("url"))),
-        }
+    def _positions(self, fids: np.ndarray) -> np.ndarray:
+        """
+        Map FAISS labels → row positions.
+        If index uses IDMap labels that match the 'id' column, resolve by id;
+        fallback: treat label as positional index. Unresolvable labels → -1.
+        """
+        fids = np.asarray(fids, dtype=np.int64)
+        pos = fids.copy()
+        lut = self._label_lut
+        if lut is not None:
+            inb = (fids >= 0) & (fids < len(lut))
+            hit = np.full(len(fids), -1, dtype=np.int64)
+            hit[inb] = lut[fids[inb]]
+            pos = np.where(hit >= 0, hit, fids)
+        pos[pos >= self.n_rows] = -1
+        return pos
+
+    def _format_rows(self, positions: List[int], scores: List[Optional[float]]) -> List[Dict[str, Any]]:
+        """
+        Return clean dicts with core + human-readable + timing fields; includes ts_url.
+        Values were sanitized at load, so each row is a copy of a prebuilt record.
+        """
+        records = self._records
+        rows: List[Dict[str, Any]] = []
+        append = rows.append
+        for p, sc in zip(positions, scores):
+            row = records[p].copy()
+            row["_score"] = sc
+            append(row)
+        return rows
 
     # ---------- Public API ----------
 
@@ -213,36 +518,112 @@ class Retriever:
 
         # Oversample to keep diversity cap without losing total k
         nprobe = max(k * oversample_factor, k)
-        scores, ids = self.index.search(qv, nprobe)
-        ids_list = ids[0].tolist()
-        scores_list = scores[0].tolist()
+        scores, ids = self._index_search(qv, nprobe)
+        return self._collect(ids[0], scores[0], k, filters)
 
-        out: List[Dict[str, Any]] = []
-        per_talk: Dict[Any, int] = {}
+    async def asearch(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        oversample_factor: int = 8,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async variant of .search() for the API routes.
 
-        for fid, sc in zip(ids_list, scores_list):
-            if fid < 0:
-                continue
+        The embedding call is awaited on the event loop; the FAISS search
+        (which releases the GIL) runs in a worker thread.
+        """
+        k = k or self.top_k_default
+        qv = await self._aembed_query(query)
 
-            row = self._row_from_faiss_id(int(fid))
+        nprobe = max(k * oversample_factor, k)
+        scores, ids = await asyncio.to_thread(self._index_search, qv, nprobe)
+        return self._collect(ids[0], scores[0], k, filters)
 
-            # Optional AND-filters (exact match)
-            if filters:
-                if not all(str(row.get(fk)) == str(fv) for fk, fv in filters.items()):
-                    continue
+    def search_batch(
+        self,
+        queries: List[str],
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        oversample_factor: int = 8,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Execute N semantic searches with one embedding request and one FAISS call.
 
-            tkey = row.get("talk_id")
-            if tkey is not None:
-                cnt = per_talk.get(tkey, 0)
-                if cnt >= self.per_talk_cap:
-                    continue
-                per_talk[tkey] = cnt + 1
+        Returns one result list per query, in input order.
+        """
+        if not queries:
+            return []
+        k = k or self.top_k_default
+        qm = self._embed_queries(queries)
 
-            out.append(self._format_row(row, sc))
-            if len(out) >= k:
-                break
+        nprobe = max(k * oversample_factor, k)
+        scores, ids = self._index_search(qm, nprobe)
+        return [self._collect(ids[i], scores[i], k, filters) for i in range(len(queries))]
 
-        return out
+    async def asearch_batch(
+        self,
+        queries: List[str],
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        oversample_factor: int = 8,
+    ) -> List[List[Dict[str, Any]]]:
+        """Async variant of .search_batch()."""
+        if not queries:
+            return []
+        k = k or self.top_k_default
+        qm = await self._aembed_queries(queries)
+
+        nprobe = max(k * oversample_factor, k)
+        scores, ids = await asyncio.to_thread(self._index_search, qm, nprobe)
+        return [self._collect(ids[i], scores[i], k, filters) for i in range(len(queries))]
+
+    def _collect(
+        self,
+        ids_row: np.ndarray,
+        scores_row: np.ndarray,
+        k: int,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Apply filters + per-talk cap to one row of FAISS results and format the hits."""
+        pos = self._positions(ids_row)
+        valid = (ids_row >= 0) & (pos >= 0)
+        pos, scores = pos[valid], scores_row[valid]
+
+        # Optional AND-filters (exact match)
+        if filters:
+            mask = np.ones(len(pos), dtype=bool)
+            for fk, fv in filters.items():
+                col = self.cols[fk][pos] if fk in self.cols else np.full(len(pos), None)
+                mask &= np.array([str(v) == str(fv) for v in col], dtype=bool)
+            pos, scores = pos[mask], scores[mask]
+
+        if not len(pos):
+            return []
+
+        # Per-talk cap: rank each hit within its talk (hits are score-ordered,
+        # the stable sort keeps that order inside each group), keep rank < cap.
+        codes = self._talk_codes[pos]
+        order = np.argsort(codes, kind="stable")
+        grouped = codes[order]
+        idx = np.arange(len(grouped))
+        starts = np.maximum.accumulate(np.where(np.r_[True, grouped[1:] != grouped[:-1]], idx, 0))
+        rank = np.empty_like(idx)
+        rank[order] = idx - starts
+        keep = np.flatnonzero((rank < self.per_talk_cap) | (codes < 0))[:k]
+
+        return self._format_rows(pos[keep].tolist(), scores[keep].tolist())
+
+    def get_by_ids(self, chunk_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Resolve chunk IDs ('talk_id:chunk_index') to rows, in request order.
+        Unknown IDs are skipped; each lookup is a dict hit, not a table scan.
+        """
+        positions = [
+            pos for pos in (self._key_index.get(str(cid).strip()) for cid in chunk_ids) if pos is not None
+        ]
+        return self._format_rows(positions, [None] * len(positions))
 
     def status(self) -> Dict[str, Any]:
         """
@@ -256,11 +637,23 @@ class Retriever:
         except Exception:
             faiss_ntotal = None
         return {
-            "parquet_rows": int(len(self.df)),
+            "parquet_rows": self.n_rows,
             "faiss_ntotal": faiss_ntotal,
+            "embed_backend": self.backend,
             "embed_model": self.model,
             "embed_dim": self.embed_dim,
             "per_talk_cap": int(self.per_talk_cap),
+            "faiss_mmap": self.faiss_mmap,
+            "faiss_mmap_error": self.faiss_mmap_error,
+            "faiss_gpu": self.faiss_gpu,
+            "faiss_gpu_error": self.faiss_gpu_error,
+            "faiss_nprobe": self.nprobe,
+            "faiss_threads": FAISS_THREADS,  # applied per search thread by _index_search
+            # SIMD build actually loaded (e.g. "OPTIMIZE AVX2"); FAISS_OPT_LEVEL /
+            # FAISS_NO_AVX2 in the environment force the generic kernels
+            "faiss_compile_options": faiss.get_compile_options().strip()
+            if hasattr(faiss, "get_compile_options") else None,
+            "embed_cache": {**self._qcache_stats, "entries": len(self._qcache) if self._qcache is not None else 0},
             "faiss_index_path": self.faiss_path,
             "metadata_path": self.parquet_path,
         }
@@ -268,22 +661,43 @@ class Retriever:
 
 # --------- Module-level helpers used by app.py ---------
 
+# Tri-state: not loaded yet (both None) → ready (_RETRIEVER) or unavailable
+# (_RETRIEVER_ERROR, re-raised without retrying until _reset_rag_state())
 _RETRIEVER: Optional[Retriever] = None
+_RETRIEVER_ERROR: Optional[Exception] = None
+_RETRIEVER_LOCK = threading.Lock()
 
 
 def _get_retriever() -> Retriever:
-    global _RETRIEVER
+    """Build the module-level Retriever on first use (never at import), once even under concurrent callers."""
+    global _RETRIEVER, _RETRIEVER_ERROR
     if _RETRIEVER is None:
-        _RETRIEVER = Retriever(
-            parquet_path=METADATA_PATH,
-            faiss_path=FAISS_INDEX_PATH,
-            model=EMBED_MODEL,
-            per_talk_cap=PER_TALK_CAP,
-            top_k_default=TOP_K_DEFAULT,
-        )
+        with _RETRIEVER_LOCK:
+            if _RETRIEVER is None:
+                if _RETRIEVER_ERROR is not None:
+                    raise _RETRIEVER_ERROR.with_traceback(None)
+                try:
+                    _RETRIEVER = Retriever(
+                        parquet_path=METADATA_PATH,
+                        faiss_path=FAISS_INDEX_PATH,
+                        model=EMBED_MODEL,
+                        per_talk_cap=PER_TALK_CAP,
+                        top_k_default=TOP_K_DEFAULT,
+                    )
+                except Exception as e:
+                    _RETRIEVER_ERROR = e
+                    raise
     return _RETRIEVER
 
 
+def _reset_rag_state() -> None:
+    """Forget the module-level Retriever (or its load failure) so the next call reloads."""
+    global _RETRIEVER, _RETRIEVER_ERROR
+    with _RETRIEVER_LOCK:
+        _RETRIEVER = None
+        _RETRIEVER_ERROR = None
+
+
 def search_chunks(query: str, top_k: int = TOP_K_DEFAULT, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """Convenience wrapper for the API layer."""
     return _get_retriever().search(query=query, k=top_k, filters=filters)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+scripts/add_snippet_column.py
+
+Bake the /answer snippet text into the Parquet metadata as a 'text_trim500'
+column (text cut at the last space before 500 chars + "…", exactly what
+rag/_strings.trim produces), so answer composition skips the per-request trim.
+
+Texts only change when the vector bundle is rebuilt, so run this once per
+bundle, then refresh the checksums:
+
+  python scripts/add_snippet_column.py
+  sha256sum vectors/bache-talks.embeddings.parquet vectors/bache-talks.index.faiss > vectors/checksums.sha256
+
+Requirements:
+  pip install pyarrow
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag._strings import SNIPPET_CHARS, SNIPPET_COLUMN, trim  # noqa: E402
+
+METADATA_PATH = os.getenv("METADATA_PATH", "vectors/bache-talks.embeddings.parquet")
+COLUMN = SNIPPET_COLUMN
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=f"Add a precomputed '{COLUMN}' column to the Parquet metadata.")
+    ap.add_argument("--parquet", default=METADATA_PATH)
+    ap.add_argument("--out", default=None, help="output path (default: overwrite --parquet)")
+    args = ap.parse_args()
+
+    table = pq.read_table(args.parquet)
+    snippets = pa.array([trim(t or "", limit=SNIPPET_CHARS) for t in table.column("text").to_pylist()], pa.string())
+    if COLUMN in table.column_names:
+        table = table.set_column(table.column_names.index(COLUMN), COLUMN, snippets)
+    else:
+        table = table.append_column(COLUMN, snippets)
+
+    out = args.out or args.parquet
+    pq.write_table(table, out, compression="zstd")
+    print(f"wrote {COLUMN} for {table.num_rows} rows → {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+scripts/build_index.py
+
+Rebuild the FAISS index from the 'embedding' column of the Parquet metadata,
+optionally as a compressed/IVF index (default: IVF + 8-bit scalar quantizer).
+
+Labels are the Parquet 'id' column, so rag/retrieve.py resolves hits exactly
+as it does for the flat IndexIDMap2 index shipped in vectors/.
+
+Usage:
+  python scripts/build_index.py                                  # IVF{auto},SQ8
+  python scripts/build_index.py --factory "IVF256,SQfp16"
+  python scripts/build_index.py --factory "IVF{nlist},Flat" --sweep  # IVFFlat + nprobe/recall table
+  python scripts/build_index.py --preset ivfpq --out vectors/bache-talks.index.pq.faiss
+  python scripts/build_index.py --out vectors/bache-talks.index.sq8.faiss
+  python scripts/build_index.py --embed-backend local --factory Flat --out vectors/bache-talks.index.local.faiss
+  FAISS_INDEX_PATH=vectors/bache-talks.index.sq8.faiss uvicorn app:app
+
+With --embed-backend local the 'text' column is re-encoded by the in-process
+ONNX model (rag/embed_local.py, same EMBED_ONNX_PATH/EMBED_TOKENIZER_PATH the
+API will use with EMBED_BACKEND=local) instead of reading 'embedding'.
+
+Requirements:
+  pip install faiss-cpu numpy pyarrow
+  (+ onnxruntime tokenizers for --embed-backend local)
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+import pyarrow.parquet as pq
+
+METADATA_PATH = os.getenv("METADATA_PATH", "vectors/bache-talks.embeddings.parquet")
+INDEX_FACTORY = os.getenv("INDEX_FACTORY", "IVF{nlist},SQ8")
+
+# Named factory strings for --preset ({nlist} is auto-filled; PQ64 needs dim % 64 == 0).
+# PQ codes are 64 B/vector vs 3 KB for SQ8 and 12 KB for Flat, at some recall
+# cost — check the printed recall@10 (and --sweep) before deploying one.
+PRESETS = {
+    "flat":     "IDMap2,Flat",
+    "ivfflat":  "IVF{nlist},Flat",
+    "sq8":      "IVF{nlist},SQ8",
+    "sqfp16":   "IVF{nlist},SQfp16",
+    "ivfpq":    "IVF{nlist},PQ64x8",
+    "opq":      "OPQ64,IVF{nlist},PQ64x8",
+    "hnsw-pq":  "IVF{nlist}_HNSW32,PQ64x8",
+}
+
+
+def _auto_nlist(n: int) -> int:
+    """~4·sqrt(N) lists, but keep ≥ 39 training points per centroid (FAISS's k-means floor)."""
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def load_embeddings(parquet_path: str) -> tuple[np.ndarray, np.ndarray]:
+    """Return (N×D float32 L2-normalized matrix, int64 labels)."""
+    table = pq.read_table(parquet_path, columns=["id", "embedding"])
+    xb = np.stack(table.column("embedding").to_numpy(zero_copy_only=False)).astype(np.float32)
+    faiss.normalize_L2(xb)
+    ids = table.column("id").to_numpy().astype(np.int64)
+    return xb, ids
+
+
+def encode_local(parquet_path: str, batch_size: int = 64) -> tuple[np.ndarray, np.ndarray]:
+    """Like load_embeddings(), but re-encode 'text' with the local ONNX model."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from rag.embed_local import LocalEmbedder
+
+    enc = LocalEmbedder()
+    table = pq.read_table(parquet_path, columns=["id", "text"])
+    texts = [t or "" for t in table.column("text").to_pylist()]
+    xb = np.vstack([enc.embed(texts[i : i + batch_size]) for i in range(0, len(texts), batch_size)])
+    faiss.normalize_L2(xb)
+    ids = table.column("id").to_numpy().astype(np.int64)
+    return xb, ids
+
+
+def build(xb: np.ndarray, ids: np.ndarray, factory: str) -> faiss.Index:
+    n, d = xb.shape
+    spec = factory.format(nlist=_auto_nlist(n))
+    index = faiss.index_factory(d, spec, faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        index.train(xb)
+    try:
+        index.add_with_ids(xb, ids)
+    except RuntimeError:
+        # Index types without native id support (e.g. HNSW) get an IDMap2 wrapper
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(xb, ids)
+    return index
+
+
+def recall_at_k(
+    index: faiss.Index, xb: np.ndarray, ids: np.ndarray, k: int = 10, nq: int = 200, nprobe: int = 16
+) -> float:
+    """Recall@k of `index` against exact inner-product search on a sample of corpus rows."""
+    rng = np.random.default_rng(0)
+    q = xb[rng.choice(len(xb), size=min(nq, len(xb)), replace=False)]
+    exact = faiss.IndexFlatIP(xb.shape[1])
+    exact.add(xb)
+    _, gt = exact.search(q, k)
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass
+    # The flat index returns row positions; map them to the labels `index` was built with
+    gt = ids[gt]
+    _, got = index.search(q, k)
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(gt, got)]))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Rebuild the FAISS index (quantized/IVF) from Parquet embeddings.")
+    ap.add_argument("--parquet", default=METADATA_PATH)
+    ap.add_argument("--out", default="vectors/bache-talks.index.sq8.faiss")
+    ap.add_argument("--factory", default=INDEX_FACTORY, help="faiss.index_factory string; {nlist} is auto-filled")
+    ap.add_argument("--preset", choices=sorted(PRESETS), help="named factory (overrides --factory)")
+    ap.add_argument("--nprobe", type=int, default=int(os.getenv("FAISS_NPROBE", "16")))
+    ap.add_argument("--sweep", action="store_true", help="print recall@10 for nprobe = 1, 2, 4, … (IVF only)")
+    ap.add_argument("--embed-backend", choices=("openai", "local"), default="openai",
+                    help="openai: reuse the Parquet 'embedding' column; local: re-encode 'text' (rag/embed_local.py)")
+    args = ap.parse_args()
+    if args.preset:
+        args.factory = PRESETS[args.preset]
+
+    t0 = time.time()
+    xb, ids = encode_local(args.parquet) if args.embed_backend == "local" else load_embeddings(args.parquet)
+    index = build(xb, ids, args.factory)
+    faiss.write_index(index, args.out)
+
+    print(f"rows={len(xb)} dim={xb.shape[1]} factory={args.factory.format(nlist=_auto_nlist(len(xb)))}")
+    print(f"recall@10 (nprobe={args.nprobe}) = {recall_at_k(index, xb, ids, nprobe=args.nprobe):.3f}")
+    if args.sweep:
+        try:
+            nlist = faiss.extract_index_ivf(index).nlist
+        except RuntimeError:
+            nlist = 0
+        nprobe = 1
+        while nprobe <= nlist:
+            print(f"  nprobe={nprobe:<5d} recall@10 = {recall_at_k(index, xb, ids, nprobe=nprobe):.3f}")
+            nprobe *= 2
+    print(f"wrote {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB) in {time.time() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
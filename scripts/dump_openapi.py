@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+scripts/dump_openapi.py
+
+Serialize the API's OpenAPI schema to openapi.json (or OPENAPI_PATH), so
+app.custom_openapi() loads it instead of rebuilding it from the routes and
+Pydantic models in every worker after each restart.
+
+Run at build time (render.yaml does) with the same BASE_URL as the service;
+the dump carries an `x-fingerprint` of app.py, its routes, the version,
+BASE_URL and the FastAPI/Pydantic versions, and the app regenerates the schema
+in-process if the fingerprint no longer matches:
+
+  python scripts/dump_openapi.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+import orjson
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import app  # noqa: E402
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Write the OpenAPI schema to disk.")
+    ap.add_argument("--out", default=app.OPENAPI_PATH)
+    args = ap.parse_args()
+
+    with open(args.out, "wb") as f:
+        f.write(orjson.dumps(app.build_openapi(), option=orjson.OPT_INDENT_2))
+    print(f"wrote OpenAPI {app.SERVICE_VERSION} schema → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""QueryCoalescer behaviour (rag/batcher.py) against a stub retriever."""
+
+import asyncio
+
+import httpx
+import numpy as np
+import openai
+import pytest
+
+from rag.batcher import QueryCoalescer
+
+DIM = 4
+
+
+def _bad_request() -> openai.BadRequestError:
+    response = httpx.Response(400, request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+    return openai.BadRequestError("invalid input", response=response, body=None)
+
+
+class StubRetriever:
+    """Embeds each text as a one-hot-ish vector; 'bad' texts are rejected like a 400."""
+
+    def __init__(self, error=_bad_request, gate: asyncio.Event = None):
+        self.error = error
+        self.gate = gate
+        self.embed_calls = []
+        self.search_calls = []
+
+    async def _aembed_queries(self, texts):
+        self.embed_calls.append(list(texts))
+        if self.gate is not None:
+            await self.gate.wait()
+        if any(t.startswith("bad") for t in texts):
+            raise self.error()
+        out = np.zeros((len(texts), DIM), dtype=np.float32)
+        for i, t in enumerate(texts):
+            out[i, len(t) % DIM] = 1.0
+        return out
+
+    def _index_search(self, qm, k):
+        self.search_calls.append(qm.shape[0])
+        return np.zeros((qm.shape[0], k), dtype=np.float32), np.zeros((qm.shape[0], k), dtype=np.int64)
+
+    def _collect(self, ids, scores, k):
+        return [{"rank": r} for r in range(k)]
+
+
+def test_bad_query_fails_only_its_own_caller():
+    async def main():
+        stub = StubRetriever()
+        c = QueryCoalescer(stub, max_wait=0.05)
+        good, bad = await asyncio.gather(c.submit("good", 2), c.submit("bad", 2), return_exceptions=True)
+        await c.aclose()
+        return stub, good, bad
+
+    stub, good, bad = asyncio.run(main())
+    assert good == [{"rank": 0}, {"rank": 1}]
+    assert isinstance(bad, openai.BadRequestError)
+    assert stub.embed_calls == [["good", "bad"], ["good"], ["bad"]]
+
+
+def test_non_input_error_fails_the_batch_without_fanout():
+    async def main():
+        stub = StubRetriever(error=lambda: TimeoutError("embeddings timed out"))
+        c = QueryCoalescer(stub, max_wait=0.05)
+        results = await asyncio.gather(c.submit("good", 2), c.submit("bad", 2), return_exceptions=True)
+        await c.aclose()
+        return stub, results
+
+    stub, results = asyncio.run(main())
+    assert all(isinstance(r, TimeoutError) for r in results)
+    assert stub.embed_calls == [["good", "bad"]]
+
+
+def test_cancelled_caller_is_dropped_from_its_batch():
+    async def main():
+        stub = StubRetriever()
+        c = QueryCoalescer(stub, max_wait=0.05)
+        keep = asyncio.create_task(c.submit("keep", 1))
+        drop = asyncio.create_task(c.submit("drop me", 1))
+        await asyncio.sleep(0.01)  # both queued, window still open
+        drop.cancel()
+        rows = await keep
+        await c.aclose()
+        return stub, rows, drop
+
+    stub, rows, drop = asyncio.run(main())
+    assert rows == [{"rank": 0}]
+    assert drop.cancelled()
+    assert stub.embed_calls == [["keep"]]
+
+
+def test_aclose_cancels_collecting_and_inflight_callers():
+    async def main():
+        gate = asyncio.Event()  # never set: dispatched batches hang in the embeddings call
+        c = QueryCoalescer(StubRetriever(gate=gate), max_batch=2, max_wait=10.0)
+        tasks = [asyncio.create_task(c.submit(f"q{i}", 1)) for i in range(3)]
+        await asyncio.sleep(0.01)  # q0+q1 in flight, q2 in the open window
+        assert len(c._inflight) == 1 and len(c._collecting) == 1
+        await c.aclose()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 1.0)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+
+
+def test_probe_hit_skips_the_search():
+    async def main():
+        stub = StubRetriever()
+        c = QueryCoalescer(stub, max_wait=0.05)
+
+        def probe(vec):
+            return "cached" if vec[0, len("hit") % DIM] == 1.0 else None
+
+        hit, miss = await asyncio.gather(c.lookup("hit", 2, probe), c.lookup("miss", 2, probe))
+        await c.aclose()
+        return stub, hit, miss
+
+    stub, (hvec, hcached, hrows), (mvec, mcached, mrows) = asyncio.run(main())
+    assert hcached == "cached" and hrows is None and hvec.shape == (1, DIM)
+    assert mcached is None and mrows == [{"rank": 0}, {"rank": 1}]
+    assert stub.embed_calls == [["hit", "miss"]]
+    assert stub.search_calls == [1]  # only the miss was searched
+
+
+@pytest.mark.parametrize("k", [1, 3])
+def test_submit_returns_k_rows(k):
+    async def main():
+        c = QueryCoalescer(StubRetriever(), max_wait=0.0)
+        rows = await c.submit("query", k)
+        await c.aclose()
+        return rows
+
+    assert len(asyncio.run(main())) == k
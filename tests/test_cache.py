@@ -0,0 +1,45 @@
+"""ResponseCache exact and semantic tiers (rag/cache.py)."""
+
+import numpy as np
+
+from rag.cache import ResponseCache
+
+
+def _unit(*xs):
+    v = np.asarray(xs, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_exact_hit_ignores_surrounding_whitespace():
+    cache = ResponseCache(maxsize=8, ttl=60)
+    cache.put("search", "ego death", 8, "resp")
+    assert cache.get("search", "  ego death ", 8) == "resp"
+    assert cache.get("search", "ego death", 5) is None
+
+
+def test_semantic_hit_respects_kind_and_variant():
+    cache = ResponseCache(maxsize=8, ttl=60, threshold=0.9)
+    vec = _unit(1, 0, 0)
+    cache.put("search", "q", 8, "search-8", vec=vec)
+
+    assert cache.get_similar("search", 8, vec) == "search-8"
+    assert cache.get_similar("search", 5, vec) is None
+    assert cache.get_similar("answer", 8, vec) is None
+
+
+def test_semantic_hit_respects_threshold():
+    cache = ResponseCache(maxsize=8, ttl=60, threshold=0.95)
+    cache.put("search", "q", 8, "resp", vec=_unit(1, 0, 0))
+
+    assert cache.get_similar("search", 8, _unit(1, 0.1, 0)) == "resp"  # cos ≈ 0.995
+    assert cache.get_similar("search", 8, _unit(1, 1, 0)) is None      # cos ≈ 0.707
+
+
+def test_semantic_slot_with_evicted_exact_entry_misses():
+    cache = ResponseCache(maxsize=1, ttl=60, threshold=0.9)
+    vec = _unit(0, 1, 0)
+    cache.put("answer", "first", "[]", "first-resp", vec=vec)
+    cache.put("answer", "second", "[]", "second-resp")  # evicts "first" from the exact tier
+
+    assert cache.get_similar("answer", "[]", vec) is None
+    assert cache.status()["misses"] == 1
@@ -0,0 +1,28 @@
+"""Load-time column derivations in rag/retrieve.py."""
+
+import pyarrow as pa
+
+from rag.retrieve import _ts_url_column
+
+
+def _table(**cols):
+    return pa.table({
+        "youtube_id": pa.array(cols["youtube_id"], pa.string()),
+        "start_sec": pa.array(cols["start_sec"], pa.float64()),
+        "url": pa.array(cols["url"], pa.string()),
+    })
+
+
+def test_ts_url_links_start_sec():
+    t = _table(youtube_id=["abc", "abc"], start_sec=[3257.9, -4.0], url=["u", "u"])
+    assert _ts_url_column(t).to_pylist() == ["https://youtu.be/abc?t=3257", "https://youtu.be/abc?t=0"]
+
+
+def test_ts_url_null_start_sec_falls_back_to_url():
+    t = _table(youtube_id=["abc", "abc"], start_sec=[None, None], url=["https://example.org/talk", None])
+    assert _ts_url_column(t).to_pylist() == ["https://example.org/talk", None]
+
+
+def test_ts_url_missing_youtube_id_falls_back_to_url():
+    t = _table(youtube_id=[None, ""], start_sec=[12.0, 12.0], url=["u1", ""])
+    assert _ts_url_column(t).to_pylist() == ["u1", None]